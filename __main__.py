@@ -1,11 +1,23 @@
+import sys
+
 from utils.Logger import Logger
+from utils.utils import METRICS_PATH
+
+if __name__ == "__main__":
+    log_mode = "rich"
+    if "--json-logs" in sys.argv:
+        log_mode = "json"
+    elif "--plain-logs" in sys.argv:
+        log_mode = "plain"
 
-logger = Logger()
-logger.set_level("DEBUG")
+    logger = Logger(metrics_path=METRICS_PATH, mode=log_mode)
+    logger.set_level("DEBUG")
 
 import os
 import types
-import sys
+
+os.environ.setdefault("GLOG_minloglevel", "2")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
 
 from torchvision.transforms.functional import rgb_to_grayscale
 
@@ -15,11 +27,20 @@ sys.modules["torchvision.transforms.functional_tensor"] = functional_tensor
 
 from clipsai import MediaEditor, ClipFinder
 from services.BackgroundGenerator import BackgroundGenerator
+from services.BatchRunner import BatchRunner
+from services.FusedRenderer import FusedRenderer
 from services.SubtitleGenerator import SubtitleGenerator
 from services.VideoPipeline import VideoPipeline
 from services.VideoResizer import VideoResizer
 from services.VideoTranscriber import VideoTranscriber
 from services.VideoTrimmer import VideoTrimmer
+from utils.AudioStore import AudioStore
+from utils.EncodingProfile import EncodingProfile
+from utils.ModelRegistry import ModelRegistry
+from utils.SceneIndex import SceneIndex
+from utils.StageCache import StageCache
+from utils.TopicIndex import TopicIndex
+from utils.TranscriptStore import TranscriptStore
 from utils.utils import SOURCES_PATH, ASSERTS_PATH
 from services.VideoScaler import VideoScaler
 from services.FrameRateReducer import FrameRateReducer
@@ -28,11 +49,27 @@ from services.PauseRemover import PauseRemover
 
 if __name__ == "__main__":
     media_editor = MediaEditor()
+    model_registry = ModelRegistry(memory_budget_mb=6144)
+    audio_store = AudioStore()
+    transcript_store = TranscriptStore()
+    scene_index = SceneIndex()
+    intermediate_profile = EncodingProfile.intermediate()
+    final_profile = EncodingProfile.final(preset="slow", crf=20)
     clip_finder = ClipFinder(device="mps")
 
-    frame_rate_reducer = FrameRateReducer(target_fps=24, logger=logger)
+    frame_rate_reducer = FrameRateReducer(
+        target_fps=24,
+        deferred=True,
+        logger=logger,
+        encoding_profile=intermediate_profile,
+    )
     video_transcriber = VideoTranscriber(
-        model_size="turbo", logger=logger, device="cpu"
+        model_size="turbo",
+        logger=logger,
+        device="cpu",
+        model_registry=model_registry,
+        audio_store=audio_store,
+        chunk_workers=4,
     )
     video_trimmer = VideoTrimmer(
         media_editor=media_editor,
@@ -40,6 +77,11 @@ if __name__ == "__main__":
         min_duration=40,
         max_duration=120,
         logger=logger,
+        workers=4,
+        snap="keyframe",
+        topic_index=TopicIndex(clip_finder=clip_finder, logger=logger),
+        scene_index=scene_index,
+        encoding_profile=intermediate_profile,
     )
     video_resizer = VideoResizer(
         media_editor=media_editor,
@@ -47,9 +89,24 @@ if __name__ == "__main__":
         face_margin=300,
         aspect_ratio=(3, 4),
         device="cpu",
+        model_registry=model_registry,
+        episode_crops=True,
+        encoding_profile=intermediate_profile,
+        scene_index=scene_index,
+        audio_store=audio_store,
+    )
+    video_scaler = VideoScaler(
+        target_width=1080,
+        ai=False,
+        logger=logger,
+        model_registry=model_registry,
+        encoding_profile=intermediate_profile,
+    )
+    background_generator = BackgroundGenerator(
+        target_ratio=(9, 16),
+        logger=logger,
+        encoding_profile=intermediate_profile,
     )
-    video_scaler = VideoScaler(target_width=1080, ai=False, logger=logger)
-    background_generator = BackgroundGenerator(target_ratio=(9, 16), logger=logger)
     subtitle_generator = SubtitleGenerator(
         device="cpu",
         font_path=os.path.join(ASSERTS_PATH, "DelaGothicOne-Regular.ttf"),
@@ -58,10 +115,17 @@ if __name__ == "__main__":
         stroke_width=2,
         stroke_color="black",
         logger=logger,
+        model_registry=model_registry,
+        audio_store=audio_store,
+        encoding_profile=intermediate_profile,
+        transcript_store=transcript_store,
     )
     pause_remover = PauseRemover(
         buffer_time=0.2,
         logger=logger,
+        encoding_profile=final_profile,
+        scene_snap=0.3,
+        scene_index=scene_index,
     )
 
     pipeline = VideoPipeline(
@@ -74,22 +138,21 @@ if __name__ == "__main__":
         subtitle_generator=subtitle_generator,
         pause_remover=pause_remover,
         logger=logger,
+        renderer=FusedRenderer(logger=logger, encoding_profile=final_profile),
+        stage_cache=StageCache(logger=logger),
+        resume="--resume" in sys.argv,
+        transcript_store=transcript_store,
     )
-    #
-    # files_to_process = [
-    #     file for file in sorted(os.listdir(SOURCES_PATH)) if file.endswith(".mp4")
-    # ]
-    # for i, file in enumerate(files_to_process, start=1):
-    #     file_path = os.path.join(SOURCES_PATH, file)
-    #     logger.log_progress(
-    #         title=f"Processing video {file} ({i}/{len(files_to_process)})"
-    #     )
-    # pipeline.process_video(
-    #     "/Users/lyuben1337/Projects/clips_maker/resources/sources/s01e05_480.mp4"
-    # )
+
+    if "--batch" in sys.argv:
+        batch_runner = BatchRunner(pipeline=pipeline, logger=logger)
+        batch_runner.run(SOURCES_PATH)
+        video_transcriber.close()
+        logger.stop()
+        sys.exit()
 
     test_file = "/Users/lyuben1337/Desktop/clips/202501212230 (4).mp4"
-    frame_rate_reducer.reduce(test_file)
+    frame_rate_reducer.reduce_clip(test_file)
     video_resizer.resize(test_file)
     video_scaler.scale(test_file)
     background_generator.add_background(test_file)
@@ -97,4 +160,5 @@ if __name__ == "__main__":
     subtitle_generator.add_subtitles(test_file, subtitles)
     pause_remover.remove_pauses(test_file, subtitles)
 
+    video_transcriber.close()
     logger.stop()
@@ -1,7 +1,15 @@
 from abc import abstractmethod
 
+from utils.RenderPlan import RenderPlan
+
 
 class IBackgroundGenerator:
     @abstractmethod
     def add_background(self, file_path: str):
-        pass
\ No newline at end of file
+        pass
+
+    def plan_background(self, render_plan: RenderPlan):
+        pass
+
+    def get_params(self) -> dict:
+        pass
@@ -1,7 +1,18 @@
 from abc import abstractmethod
 
+from utils.RenderPlan import RenderPlan
+
 
 class IFrameRateReducer:
     @abstractmethod
     def reduce(self, file_path: str):
         pass
+
+    def reduce_clip(self, file_path: str):
+        pass
+
+    def plan_reduce(self, render_plan: RenderPlan):
+        pass
+
+    def get_params(self) -> dict:
+        pass
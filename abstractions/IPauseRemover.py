@@ -1,7 +1,27 @@
 from abc import abstractmethod
 
+from utils.RenderPlan import RenderPlan
+
 
 class IPauseRemover:
     @abstractmethod
-    def remove_pauses(self, file_path: str, subtitles: list):
+    def remove_pauses(
+        self,
+        file_path: str,
+        subtitles: list,
+        source_path: str = None,
+        start_time: float = 0,
+    ):
+        pass
+
+    def plan_pause_removal(
+        self,
+        render_plan: RenderPlan,
+        subtitles: list,
+        source_path: str = None,
+        start_time: float = 0,
+    ):
+        pass
+
+    def get_params(self) -> dict:
         pass
@@ -0,0 +1,12 @@
+from abc import abstractmethod
+
+from utils.RenderPlan import RenderPlan
+
+
+class IRenderer:
+    @abstractmethod
+    def render(self, plan: RenderPlan, output_path: str = None):
+        pass
+
+    def get_params(self) -> dict:
+        pass
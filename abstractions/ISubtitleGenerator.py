@@ -1,12 +1,29 @@
 from abc import abstractmethod
 
+from clipsai import Transcription
+
+from utils.RenderPlan import RenderPlan
+
 
 class ISubtitleGenerator:
     @abstractmethod
     def add_subtitles(self, file_path: str, subtitles: list):
         pass
 
-    def generate_subtitles(self, file_path: str) -> list:
+    def plan_subtitles(self, render_plan: RenderPlan, subtitles: list):
+        pass
+
+    def generate_subtitles(
+        self,
+        file_path: str,
+        transcription: Transcription = None,
+        start_time: float = 0,
+        end_time: float = None,
+        source_path: str = None,
+    ) -> list:
+        pass
+
+    def export_subtitles(self, file_path: str, subtitles: list, size) -> str:
         pass
 
     def save_to_file(self, file_path: str, subtitles: list):
@@ -14,3 +31,6 @@ class ISubtitleGenerator:
 
     def load_from_file(self, file_path: str) -> list:
         pass
+
+    def get_params(self) -> dict:
+        pass
@@ -1,7 +1,30 @@
 from abc import abstractmethod
 
+from clipsai import Crops
+
+from utils.RenderPlan import RenderPlan
+
 
 class IVideoResizer:
     @abstractmethod
-    def resize(self, file_path: str):
+    def resize(self, file_path: str, crops: Crops = None):
+        pass
+
+    def plan_resize(self, render_plan: RenderPlan, crops: Crops = None):
+        pass
+
+    def find_crops(
+        self, file_path: str, source_path: str = None, start_time: float = 0
+    ) -> Crops:
+        pass
+
+    def plan_episode(self, file_path: str) -> Crops or None:
+        pass
+
+    def clip_crops(
+        self, episode_crops: Crops, start_time: float, end_time: float
+    ) -> Crops:
+        pass
+
+    def get_params(self) -> dict:
         pass
@@ -1,7 +1,15 @@
 from abc import abstractmethod
 
+from utils.RenderPlan import RenderPlan
+
 
 class IVideoScaler:
     @abstractmethod
     def scale(self, file_path: str):
         pass
+
+    def plan_scale(self, render_plan: RenderPlan):
+        pass
+
+    def get_params(self) -> dict:
+        pass
@@ -10,3 +10,6 @@ class IVideoTranscriber:
         batch_size: int = 16,
     ):
         pass
+
+    def get_params(self) -> dict:
+        pass
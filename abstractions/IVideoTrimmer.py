@@ -6,3 +6,21 @@ class IVideoTrimmer:
     @abstractmethod
     def trim_clips(self, transcription: Transcription, file_path: str) -> list[str]:
         pass
+
+    def find_clips(
+        self,
+        transcription: Transcription,
+        file_path: str = None,
+        min_duration: float = None,
+        max_duration: float = None,
+    ) -> list[Clip]:
+        pass
+
+    def snap_clips(self, clips: list[Clip], file_path: str) -> list[Clip]:
+        pass
+
+    def trim(self, clips: list[Clip], file_path: str) -> list[str]:
+        pass
+
+    def get_params(self) -> dict:
+        pass
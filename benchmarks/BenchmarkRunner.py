@@ -0,0 +1,154 @@
+import json
+import os
+import platform
+import shutil
+import threading
+import time
+
+import psutil
+
+from benchmarks.Fixtures import Fixtures
+from utils.Logger import Logger
+
+
+class BenchmarkRunner:
+    METRICS = ("wall_time", "peak_rss_mb")
+
+    def __init__(
+        self,
+        logger: Logger,
+        fixtures: Fixtures,
+        work_path: str,
+        repeats: int = 1,
+        sample_interval: float = 0.05,
+    ):
+        self._logger = logger
+        self._fixtures = fixtures
+        self._work_path = work_path
+        self._repeats = max(1, repeats)
+        self._sample_interval = sample_interval
+        os.makedirs(self._work_path, exist_ok=True)
+
+    def run(self, cases: dict, resolutions: list[str]) -> dict:
+        results = []
+        for resolution in resolutions:
+            fixture_path = self._fixtures.video(resolution)
+            for name, case in cases.items():
+                self._logger.log_progress(subtitle=f"{name} @ {resolution}")
+                try:
+                    results.append(self.__measure(name, resolution, fixture_path, case))
+                except Exception as e:
+                    self._logger.error(f"{name} @ {resolution} failed: {str(e)}")
+                    results.append(
+                        {"case": name, "resolution": resolution, "error": str(e)}
+                    )
+
+        return {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+            },
+            "fixture": {"duration": self._fixtures.duration, "fps": self._fixtures.fps},
+            "results": results,
+        }
+
+    @classmethod
+    def compare(cls, report: dict, baseline: dict, threshold: float) -> list[str]:
+        baseline_results = {
+            (result["case"], result["resolution"]): result
+            for result in baseline.get("results", [])
+            if "error" not in result
+        }
+
+        regressions = []
+        for result in report["results"]:
+            reference = baseline_results.get((result["case"], result["resolution"]))
+            if reference is None or "error" in result:
+                continue
+            for metric in cls.METRICS:
+                if not reference[metric]:
+                    continue
+                change = result[metric] / reference[metric] - 1
+                result[f"{metric}_change"] = round(change, 4)
+                if change > threshold:
+                    regressions.append(
+                        f"{result['case']} @ {result['resolution']}: {metric} "
+                        f"{reference[metric]:.2f} -> {result[metric]:.2f} "
+                        f"(+{change:.0%})"
+                    )
+        return regressions
+
+    @staticmethod
+    def save(report: dict, file_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        temp_file_path = f"{file_path}.temp"
+        with open(temp_file_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+        os.replace(temp_file_path, file_path)
+
+    @staticmethod
+    def load(file_path: str) -> dict:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def __measure(self, name: str, resolution: str, fixture_path: str, case) -> dict:
+        wall_times, peak_rss = [], 0
+        for _ in range(self._repeats):
+            file_path = os.path.join(self._work_path, f"{name}_{resolution}.mp4")
+            shutil.copyfile(fixture_path, file_path)
+
+            sampler = RssSampler(self._sample_interval)
+            sampler.start()
+            start_time = time.perf_counter()
+            try:
+                case(file_path)
+            finally:
+                wall_times.append(time.perf_counter() - start_time)
+                peak_rss = max(peak_rss, sampler.stop())
+
+        wall_time = min(wall_times)
+        frames = round(self._fixtures.duration * self._fixtures.fps)
+        return {
+            "case": name,
+            "resolution": resolution,
+            "wall_time": round(wall_time, 4),
+            "fps": round(frames / wall_time, 2),
+            "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+            "output_size": os.path.getsize(file_path),
+        }
+
+
+class RssSampler:
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._process = psutil.Process()
+        self._peak = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self.__sample, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self._thread.join()
+        self.__update()
+        return self._peak
+
+    def __sample(self):
+        while not self._stop_event.wait(self._interval):
+            self.__update()
+
+    def __update(self):
+        try:
+            rss = self._process.memory_info().rss
+            for child in self._process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            return
+        self._peak = max(self._peak, rss)
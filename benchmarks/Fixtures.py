@@ -0,0 +1,92 @@
+import os
+import subprocess
+
+from utils.utils import RESULTS_PATH
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+
+class Fixtures:
+    def __init__(
+        self,
+        fixtures_path: str = os.path.join(RESULTS_PATH, "benchmarks", "fixtures"),
+        duration: float = 10,
+        fps: int = 30,
+    ):
+        self._fixtures_path = fixtures_path
+        self._duration = duration
+        self._fps = fps
+        os.makedirs(self._fixtures_path, exist_ok=True)
+
+    @property
+    def duration(self) -> float:
+        return self._duration
+
+    @property
+    def fps(self) -> int:
+        return self._fps
+
+    def video(self, resolution: str) -> str:
+        width, height = RESOLUTIONS[resolution]
+        file_path = os.path.join(
+            self._fixtures_path,
+            f"testsrc_{resolution}_{self._fps}fps_{self._duration:g}s.mp4",
+        )
+        if os.path.exists(file_path):
+            return file_path
+
+        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-f",
+                "lavfi",
+                "-i",
+                f"testsrc2=size={width}x{height}:rate={self._fps}:duration={self._duration:g}",
+                "-f",
+                "lavfi",
+                "-i",
+                f"sine=frequency=440:sample_rate=48000:duration={self._duration:g}",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "veryfast",
+                "-g",
+                str(self._fps * 2),
+                "-pix_fmt",
+                "yuv420p",
+                "-c:a",
+                "aac",
+                "-shortest",
+                temp_file_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        os.replace(temp_file_path, file_path)
+        return file_path
+
+    def subtitles(
+        self, speech: float = 2.0, pause: float = 1.0, words_per_line: int = 2
+    ) -> list:
+        subtitles = []
+        word_duration = speech / (words_per_line * 2)
+        phrase_start = 0.0
+        index = 0
+        while phrase_start + speech <= self._duration:
+            for line in range(2):
+                start = phrase_start + line * speech / 2
+                words = [f"word{index + i}" for i in range(words_per_line)]
+                subtitles.append(
+                    ((start, start + word_duration * words_per_line), " ".join(words))
+                )
+                index += words_per_line
+            phrase_start += speech + pause
+        return subtitles
@@ -0,0 +1,198 @@
+import argparse
+import logging
+import os
+import sys
+
+from clipsai import Clip, Crops, MediaEditor, Segment
+
+from benchmarks.BenchmarkRunner import BenchmarkRunner
+from benchmarks.Fixtures import RESOLUTIONS, Fixtures
+from services.BackgroundGenerator import BackgroundGenerator
+from services.FrameRateReducer import FrameRateReducer
+from services.FusedRenderer import FusedRenderer
+from services.PauseRemover import PauseRemover
+from services.SubtitleGenerator import SubtitleGenerator
+from services.VideoPipeline import VideoPipeline
+from services.VideoResizer import VideoResizer
+from services.VideoScaler import VideoScaler
+from utils.Logger import Logger
+from utils.MediaProbe import MediaProbe
+from utils.SceneIndex import SceneIndex
+from utils.utils import ASSERTS_PATH, RESULTS_PATH
+
+BENCHMARKS_PATH = os.path.join(RESULTS_PATH, "benchmarks")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+FONT_PATH = os.path.join(ASSERTS_PATH, "DelaGothicOne-Regular.ttf")
+ASPECT_RATIO = (3, 4)
+
+
+class FixtureSubtitleGenerator(SubtitleGenerator):
+    def __init__(self, subtitles: list, **kwargs):
+        super().__init__(**kwargs)
+        self._subtitles = subtitles
+
+    def generate_subtitles(self, file_path: str, *args, **kwargs) -> list:
+        return self._subtitles
+
+
+def centered_crops(file_path: str) -> Crops:
+    metadata = MediaProbe.shared().probe(file_path)
+    width, height = metadata["width"], metadata["height"]
+    crop_width = int(height * ASPECT_RATIO[0] / ASPECT_RATIO[1]) // 2 * 2
+    return Crops(
+        width,
+        height,
+        crop_width,
+        height,
+        [Segment([], 0, metadata["duration"], (width - crop_width) // 2 // 2 * 2, 0)],
+    )
+
+
+def build_cases(logger: Logger, fixtures: Fixtures) -> dict:
+    subtitles = fixtures.subtitles()
+    media_editor = MediaEditor()
+
+    def subtitle_generator(backend: str) -> SubtitleGenerator:
+        return FixtureSubtitleGenerator(
+            subtitles,
+            device="cpu",
+            font_path=FONT_PATH,
+            color="white",
+            max_words_per_line=2,
+            stroke_width=2,
+            stroke_color="black",
+            logger=logger,
+            backend=backend,
+        )
+
+    video_resizer = VideoResizer(
+        media_editor=media_editor,
+        logger=logger,
+        face_margin=300,
+        aspect_ratio=ASPECT_RATIO,
+        device="cpu",
+    )
+
+    def pipeline(renderer=None) -> VideoPipeline:
+        return VideoPipeline(
+            frame_rate_reducer=FrameRateReducer(
+                target_fps=24, deferred=True, logger=logger
+            ),
+            video_transcriber=None,
+            video_trimmer=None,
+            video_scaler=VideoScaler(target_width=1080, ai=False, logger=logger),
+            video_resizer=video_resizer,
+            background_generator=BackgroundGenerator(logger=logger, fast=True),
+            subtitle_generator=subtitle_generator("ass"),
+            pause_remover=PauseRemover(buffer_time=0.2, logger=logger),
+            logger=logger,
+            renderer=renderer,
+        )
+
+    def process_clip(video_pipeline: VideoPipeline):
+        def run(file_path: str):
+            duration = MediaProbe.shared().duration(file_path)
+            if not video_pipeline.process_clip(
+                file_path, Clip(0, duration, 0, 0), None, centered_crops(file_path)
+            ):
+                raise RuntimeError("pipeline failed, see log")
+
+        return run
+
+    return {
+        "frame_rate": FrameRateReducer(target_fps=24, logger=logger).reduce,
+        "resize": lambda file_path: video_resizer.resize(
+            file_path, centered_crops(file_path)
+        ),
+        "scale": VideoScaler(target_width=1080, ai=False, logger=logger).scale,
+        "background": BackgroundGenerator(logger=logger).add_background,
+        "background_fast": BackgroundGenerator(logger=logger, fast=True).add_background,
+        "subtitles": lambda file_path: subtitle_generator("moviepy").add_subtitles(
+            file_path, subtitles
+        ),
+        "subtitles_ass": lambda file_path: subtitle_generator("ass").add_subtitles(
+            file_path, subtitles
+        ),
+        "pauses": lambda file_path: PauseRemover(
+            buffer_time=0.2, logger=logger
+        ).remove_pauses(file_path, subtitles),
+        "pauses_stream_copy": lambda file_path: PauseRemover(
+            buffer_time=0.2, logger=logger, stream_copy=True
+        ).remove_pauses(file_path, subtitles),
+        "scenes": lambda file_path: SceneIndex().detect(file_path),
+        "pipeline": process_clip(pipeline()),
+        "pipeline_fused": process_clip(pipeline(FusedRenderer(logger=logger))),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--cases", nargs="*", help="Cases to run, all by default")
+    parser.add_argument(
+        "--resolutions", nargs="*", default=list(RESOLUTIONS), choices=RESOLUTIONS
+    )
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument(
+        "--output", default=os.path.join(BENCHMARKS_PATH, "results.json")
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    logger = Logger()
+    logger.set_level(logging.INFO)
+
+    fixtures = Fixtures(
+        os.path.join(BENCHMARKS_PATH, "fixtures"), duration=args.duration, fps=args.fps
+    )
+    cases = build_cases(logger, fixtures)
+    unknown_cases = set(args.cases or []) - set(cases)
+    if unknown_cases:
+        logger.stop()
+        sys.exit(f"Unknown cases: {', '.join(sorted(unknown_cases))}")
+    if args.cases:
+        cases = {name: case for name, case in cases.items() if name in args.cases}
+
+    runner = BenchmarkRunner(
+        logger=logger,
+        fixtures=fixtures,
+        work_path=os.path.join(BENCHMARKS_PATH, "work"),
+        repeats=args.repeats,
+    )
+    report = runner.run(cases, args.resolutions)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        regressions = BenchmarkRunner.compare(
+            report, BenchmarkRunner.load(args.baseline), args.threshold
+        )
+    BenchmarkRunner.save(report, args.output)
+    if args.update_baseline:
+        BenchmarkRunner.save(report, args.baseline)
+    logger.stop()
+
+    for result in report["results"]:
+        if "error" in result:
+            print(
+                f"{result['case']:>20} {result['resolution']:>6}  ERROR {result['error']}"
+            )
+            continue
+        print(
+            f"{result['case']:>20} {result['resolution']:>6}  "
+            f"{result['wall_time']:8.2f}s {result['fps']:8.1f} fps "
+            f"{result['peak_rss_mb']:8.1f} MB {result['output_size'] / 1024:10.0f} KB"
+        )
+    print(f"Results saved to {args.output}")
+
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
@@ -2,16 +2,59 @@ import os
 import cv2
 from moviepy import VideoFileClip, CompositeVideoClip
 from abstractions.IBackgroundGenerator import IBackgroundGenerator
+from utils.EncodingProfile import EncodingProfile
 from utils.Logger import Logger
+from utils.RenderPlan import RenderPlan
 
 
 class BackgroundGenerator(IBackgroundGenerator):
-    def __init__(self, logger: Logger, target_ratio: tuple[int, int] = (9, 16)):
+    def __init__(
+        self,
+        logger: Logger,
+        target_ratio: tuple[int, int] = (9, 16),
+        fast: bool = False,
+        pyramid_levels: int = 3,
+        refresh_fps: float = None,
+        encoding_profile: EncodingProfile = None,
+    ):
         self._target_ratio = target_ratio
         self._logger = logger
+        self._fast = fast
+        self._pyramid_levels = pyramid_levels
+        self._refresh_fps = refresh_fps
+        self._encoding_profile = encoding_profile or EncodingProfile()
+
+    def get_params(self) -> dict:
+        params = {
+            "target_ratio": self._target_ratio,
+            "encoding": self._encoding_profile.get_params(),
+        }
+        if self._fast:
+            params.update(
+                fast=True,
+                pyramid_levels=self._pyramid_levels,
+                refresh_fps=self._refresh_fps,
+            )
+        return params
 
     def add_background(self, file_path: str):
-        clip = VideoFileClip(file_path)
+        final_clip = self.__compose(VideoFileClip(file_path))
+
+        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
+        final_clip.write_videofile(
+            filename=temp_file_path,
+            **self._encoding_profile.moviepy_params(temp_file_path),
+        )
+        os.replace(temp_file_path, file_path)
+
+        self._logger.info(
+            f"Background added successfully! New resolution: {final_clip.w}x{final_clip.h}"
+        )
+
+    def plan_background(self, render_plan: RenderPlan):
+        render_plan.add("background", self.__compose)
+
+    def __compose(self, clip):
         orig_width, orig_height = clip.size
         target_width, target_height = self._target_ratio
         target_ratio = target_width / target_height
@@ -23,11 +66,14 @@ class BackgroundGenerator(IBackgroundGenerator):
 
         self._logger.info(f"Blurred clip resolution: {blurred_width}x{blurred_height}")
 
-        blurred_clip = clip.image_transform(
-            lambda frame: self.__blur_and_resize_frame(
-                frame, blurred_width, blurred_height
+        if self._fast:
+            blurred_clip = self.__fast_blurred_clip(clip, blurred_width, blurred_height)
+        else:
+            blurred_clip = clip.image_transform(
+                lambda frame: self.__blur_and_resize_frame(
+                    frame, blurred_width, blurred_height
+                )
             )
-        )
 
         final_clip = CompositeVideoClip(
             [
@@ -37,15 +83,7 @@ class BackgroundGenerator(IBackgroundGenerator):
             size=(orig_width, blurred_height),
         )
 
-        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
-        final_clip.write_videofile(
-            filename=temp_file_path, codec="libx264", audio_codec="aac"
-        )
-        os.replace(temp_file_path, file_path)
-
-        self._logger.info(
-            f"Background added successfully! New resolution: {orig_width}x{blurred_height}"
-        )
+        return final_clip
 
     def __blur_and_resize_frame(self, frame, target_width, target_height):
         blurred_frame = cv2.GaussianBlur(frame, (51, 51), 0)
@@ -58,3 +96,39 @@ class BackgroundGenerator(IBackgroundGenerator):
         cropped_frame = resized_frame[:, start_x : start_x + new_width]
 
         return cropped_frame
+
+    def __fast_blurred_clip(self, clip, target_width, target_height):
+        self._logger.info(
+            f"Fast background: 1/{2 ** self._pyramid_levels} resolution blur, "
+            f"refresh at {self._refresh_fps or clip.fps} fps"
+        )
+        cache = {}
+
+        def backdrop(get_frame, t):
+            key = int(t * self._refresh_fps) if self._refresh_fps else t
+            if key not in cache:
+                cache.clear()
+                cache[key] = self.__fast_blur_and_resize_frame(
+                    get_frame(t), target_width, target_height
+                )
+            return cache[key]
+
+        return clip.transform(backdrop)
+
+    def __fast_blur_and_resize_frame(self, frame, target_width, target_height):
+        small_frame = frame
+        for _ in range(self._pyramid_levels):
+            small_frame = cv2.pyrDown(small_frame)
+        small_frame = cv2.blur(small_frame, (3, 3))
+
+        new_width = int(target_height * self._target_ratio[0] / self._target_ratio[1])
+        start_x = target_width - new_width
+        scale = small_frame.shape[1] / target_width
+        small_start_x = int(start_x * scale)
+        small_end_x = max(small_start_x + 1, int((start_x + new_width) * scale))
+
+        return cv2.resize(
+            small_frame[:, small_start_x:small_end_x],
+            (new_width, target_height),
+            interpolation=cv2.INTER_LINEAR,
+        )
@@ -0,0 +1,111 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from services.VideoPipeline import VideoPipeline
+from utils.Logger import Logger
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        pipeline: VideoPipeline,
+        logger: Logger,
+        inference_workers: int = 1,
+        encode_workers: int = None,
+        io_workers: int = 4,
+    ):
+        self._pipeline = pipeline
+        self._logger = logger
+        self._inference_workers = inference_workers
+        self._encode_workers = encode_workers or max(1, (os.cpu_count() or 2) // 2)
+        self._io_workers = io_workers
+
+        self._lock = threading.Lock()
+        self._futures = []
+        self._failed = []
+
+    def run(self, folder: str) -> list[str]:
+        files = [
+            os.path.join(folder, file)
+            for file in sorted(os.listdir(folder))
+            if file.endswith(".mp4")
+        ]
+        return self.run_files(files)
+
+    def run_files(self, file_paths: list[str]) -> list[str]:
+        self._logger.info(
+            f"Batch of {len(file_paths)} videos: "
+            f"{self._inference_workers} inference, "
+            f"{self._io_workers} trimming, "
+            f"{self._encode_workers} encoding workers"
+        )
+        self._futures = []
+        self._failed = []
+
+        with ThreadPoolExecutor(
+            self._inference_workers, thread_name_prefix="inference"
+        ) as self._inference_pool, ThreadPoolExecutor(
+            self._io_workers, thread_name_prefix="io"
+        ) as self._io_pool, ThreadPoolExecutor(
+            self._encode_workers, thread_name_prefix="encode"
+        ) as self._encode_pool:
+            for file_path in file_paths:
+                self.__submit(self._inference_pool, self.__transcribe, file_path)
+
+            self.__wait_all()
+
+        self._logger.info(f"Batch finished, {len(self._failed)} failed")
+        return self._failed
+
+    def __transcribe(self, file_path: str):
+        transcription = self._pipeline.transcribe_video(file_path)
+        episode_crops = self._pipeline.crop_video(file_path)
+        self.__submit(
+            self._io_pool, self.__trim, file_path, transcription, episode_crops
+        )
+
+    def __trim(self, file_path: str, transcription, episode_crops):
+        clips = self._pipeline.trim_video(file_path, transcription)
+        self._logger.info(f"{os.path.basename(file_path)}: {len(clips)} clips queued")
+        for clip, clip_path in clips:
+            self.__submit(
+                self._encode_pool,
+                self.__process_clip,
+                clip_path,
+                clip,
+                transcription,
+                episode_crops,
+                file_path,
+            )
+
+    def __process_clip(
+        self, clip_path: str, clip, transcription, episode_crops, source_path: str
+    ):
+        if not self._pipeline.process_clip(
+            clip_path, clip, transcription, episode_crops, source_path
+        ):
+            self.__fail(clip_path)
+
+    def __submit(self, pool: ThreadPoolExecutor, task, name: str, *args):
+        future = pool.submit(task, name, *args)
+        future.add_done_callback(lambda f: self.__on_done(f, name))
+        with self._lock:
+            self._futures.append(future)
+
+    def __on_done(self, future, name: str):
+        if future.exception():
+            self._logger.error(f"{name} failed: {future.exception()}")
+            self.__fail(name)
+
+    def __fail(self, name: str):
+        with self._lock:
+            self._failed.append(name)
+
+    def __wait_all(self):
+        while True:
+            with self._lock:
+                pending = [future for future in self._futures if not future.done()]
+            if not pending:
+                return
+            wait(pending)
@@ -3,26 +3,64 @@ import os
 from moviepy import VideoFileClip
 
 from abstractions.IFrameRateReducer import IFrameRateReducer
+from utils.EncodingProfile import EncodingProfile
 from utils.Logger import Logger
+from utils.MediaProbe import MediaProbe
+from utils.RenderPlan import RenderPlan
 
 
 class FrameRateReducer(IFrameRateReducer):
-    def __init__(self, logger: Logger, target_fps: int = 24):
+    def __init__(
+        self,
+        logger: Logger,
+        target_fps: int = 24,
+        deferred: bool = False,
+        media_probe: MediaProbe = None,
+        encoding_profile: EncodingProfile = None,
+    ):
         self._target_fps = target_fps
         self._logger = logger
+        self._deferred = deferred
+        self._media_probe = media_probe or MediaProbe.shared()
+        self._encoding_profile = encoding_profile or EncodingProfile()
+
+    def get_params(self) -> dict:
+        return {
+            "target_fps": self._target_fps,
+            "encoding": self._encoding_profile.get_params(),
+        }
 
     def reduce(self, file_path: str):
-        clip = VideoFileClip(file_path)
-        self._logger.info(f"Current frame rate: {round(clip.fps)}")
+        if self._deferred:
+            self._logger.info(f"Frame rate reducing deferred to clips")
+            return
+        self.__reduce(file_path)
+
+    def reduce_clip(self, file_path: str):
+        if self._deferred:
+            self.__reduce(file_path)
+
+    def __reduce(self, file_path: str):
+        fps = self._media_probe.fps(file_path)
+        self._logger.info(f"Current frame rate: {round(fps)}")
         self._logger.info(f"Target frame rate: {self._target_fps}")
-        if clip.fps <= self._target_fps:
+        if fps <= self._target_fps:
             self._logger.info(f"Frame rate reducing not needed")
             return
 
         temp_file_path = file_path.replace(".mp4", "_temp.mp4")
-        clip.with_fps(self._target_fps).write_videofile(
-            temp_file_path, codec="libx264", audio_codec="aac"
+        VideoFileClip(file_path).with_fps(self._target_fps).write_videofile(
+            temp_file_path, **self._encoding_profile.moviepy_params(temp_file_path)
         )
         os.replace(temp_file_path, file_path)
 
         self._logger.info(f"Frame rate reduced to {self._target_fps}")
+
+    def plan_reduce(self, render_plan: RenderPlan):
+        render_plan.add("frame rate", self.__reduce_clip)
+
+    def __reduce_clip(self, clip):
+        if clip.fps <= self._target_fps:
+            return clip
+        self._logger.info(f"Frame rate {round(clip.fps)} -> {self._target_fps}")
+        return clip.with_fps(self._target_fps)
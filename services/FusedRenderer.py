@@ -0,0 +1,46 @@
+import os
+
+from moviepy import VideoFileClip
+
+from abstractions.IRenderer import IRenderer
+from utils.EncodingProfile import EncodingProfile
+from utils.Logger import Logger
+from utils.RenderPlan import RenderPlan
+
+
+class FusedRenderer(IRenderer):
+    def __init__(self, logger: Logger, encoding_profile: EncodingProfile = None):
+        self._logger = logger
+        self._encoding_profile = encoding_profile or EncodingProfile()
+
+    def get_params(self) -> dict:
+        return {"encoding": self._encoding_profile.get_params()}
+
+    def render(self, plan: RenderPlan, output_path: str = None):
+        if not plan:
+            self._logger.info("Render plan is empty, nothing to render")
+            return
+
+        self._logger.info(f"Rendering {' -> '.join(plan.names())} in a single pass")
+
+        clip = VideoFileClip(plan.file_path)
+        for name, operation in plan.operations:
+            self._logger.debug(f"Applying '{name}'")
+            clip = operation(clip)
+
+        ffmpeg_params = []
+        filters = [
+            build(clip, plan.time_map_after(position))
+            for position, _, build in plan.filters
+        ]
+        if filters:
+            ffmpeg_params += ["-vf", ",".join(filters)]
+
+        temp_file_path = plan.file_path.replace(".mp4", "_temp.mp4")
+        clip.write_videofile(
+            filename=temp_file_path,
+            **self._encoding_profile.moviepy_params(temp_file_path, ffmpeg_params),
+        )
+        os.replace(temp_file_path, output_path or plan.file_path)
+
+        self._logger.info(f"Rendered resolution: {clip.w}x{clip.h}")
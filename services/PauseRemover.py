@@ -1,20 +1,118 @@
+import bisect
 import os
+import shutil
+import subprocess
 
 from moviepy import VideoFileClip, concatenate_videoclips
 
 from abstractions.IPauseRemover import IPauseRemover
+from utils.EncodingProfile import EncodingProfile
 from utils.Logger import Logger
+from utils.MediaProbe import MediaProbe
+from utils.RenderPlan import RenderPlan
+from utils.SceneIndex import SceneIndex
+
+
+ENCODER_CODECS = {"libx264": "h264", "libx265": "hevc", "libsvtav1": "av1"}
 
 
 class PauseRemover(IPauseRemover):
-    def __init__(self, buffer_time: float, logger: Logger):
+    def __init__(
+        self,
+        buffer_time: float,
+        logger: Logger,
+        merge_gap: float = 0,
+        stream_copy: bool = False,
+        media_probe: MediaProbe = None,
+        encoding_profile: EncodingProfile = None,
+        scene_snap: float = 0,
+        scene_index: SceneIndex = None,
+    ):
         self._buffer_time = buffer_time
         self._logger = logger
+        self._merge_gap = merge_gap
+        self._stream_copy = stream_copy
+        self._media_probe = media_probe or MediaProbe.shared()
+        self._encoding_profile = encoding_profile or EncodingProfile()
+        self._scene_snap = scene_snap
+        self._scene_index = scene_index or SceneIndex.shared()
+
+    def get_params(self) -> dict:
+        params = {
+            "buffer_time": self._buffer_time,
+            "merge_gap": self._merge_gap,
+            "stream_copy": self._stream_copy,
+            "encoding": self._encoding_profile.get_params(),
+        }
+        if self._scene_snap:
+            params.update(
+                scene_snap=self._scene_snap, scenes=self._scene_index.get_params()
+            )
+        return params
+
+    def remove_pauses(
+        self,
+        file_path: str,
+        subtitles: list,
+        source_path: str = None,
+        start_time: float = 0,
+    ):
+        if self._stream_copy and self.__is_final_encoded(file_path):
+            self.__smart_cut(file_path, subtitles, source_path, start_time)
+            return
+
+        final_video = self.__cut(
+            VideoFileClip(file_path), subtitles, source_path, start_time
+        )
+
+        output_path = file_path.replace(".mp4", "_no_pauses.mp4")
+        final_video.write_videofile(
+            output_path, **self._encoding_profile.moviepy_params(output_path)
+        )
+        os.replace(output_path, file_path)
+
+    def plan_pause_removal(
+        self,
+        render_plan: RenderPlan,
+        subtitles: list,
+        source_path: str = None,
+        start_time: float = 0,
+    ):
+        segments = []
 
-    def remove_pauses(self, file_path: str, subtitles: list):
-        video = VideoFileClip(file_path)
+        def cut(video):
+            segments.extend(
+                self.__find_segments(
+                    video.duration,
+                    subtitles,
+                    self.__scene_cuts(source_path, start_time, video.duration),
+                )
+            )
+            return self.__concatenate(video, segments)
 
-        self._logger.info(f"Original video duration: {video.duration}")
+        render_plan.add("pause removal", cut)
+        render_plan.add_time_map(lambda t: self.__remap_time(t, segments))
+
+    def __cut(self, video, subtitles: list, source_path: str, start_time: float):
+        segments = self.__find_segments(
+            video.duration,
+            subtitles,
+            self.__scene_cuts(source_path, start_time, video.duration),
+        )
+        return self.__concatenate(video, segments)
+
+    def __scene_cuts(
+        self, source_path: str, start_time: float, duration: float
+    ) -> list[float]:
+        if not self._scene_snap or not source_path:
+            return []
+        cuts = self._scene_index.load(source_path)
+        return SceneIndex.window(cuts, start_time, start_time + duration).tolist()
+
+    def __find_segments(
+        self, duration: float, subtitles: list, cuts: list[float] = ()
+    ) -> list[tuple]:
+        self._logger.info(f"Original video duration: {duration}")
         self._logger.info(f"Buffer time: {self._buffer_time}")
 
         segments = []
@@ -22,7 +120,7 @@ class PauseRemover(IPauseRemover):
 
         for (start, end), _ in subtitles:
             adjusted_start = max(0, start - self._buffer_time)
-            adjusted_end = min(video.duration, end + self._buffer_time)
+            adjusted_end = min(duration, end + self._buffer_time)
 
             if adjusted_start < prev_end:
                 adjusted_start = prev_end
@@ -31,11 +129,235 @@ class PauseRemover(IPauseRemover):
             prev_end = adjusted_end
 
         self._logger.info(f"Found {len(segments) - 1} pauses")
-        clips = [video.subclipped(start, end) for start, end in segments if start < end]
+        if cuts:
+            segments = self.__snap_segments(segments, cuts, duration)
+        segments = [(start, end) for start, end in segments if start < end]
+        if self._merge_gap:
+            segments = self.__merge_segments(segments)
+        return segments
+
+    def __snap_segments(
+        self, segments: list[tuple], cuts: list[float], duration: float
+    ) -> list[tuple]:
+        snapped = []
+        snapped_count = 0
+        prev_end = 0
+        for start, end in segments:
+            index = bisect.bisect_right(cuts, start) - 1
+            if index >= 0 and start - cuts[index] <= self._scene_snap:
+                start = cuts[index]
+                snapped_count += 1
+            index = bisect.bisect_left(cuts, end)
+            if index < len(cuts) and cuts[index] - end <= self._scene_snap:
+                end = min(cuts[index], duration)
+                snapped_count += 1
+
+            start = max(start, prev_end)
+            snapped.append((start, end))
+            prev_end = max(prev_end, end)
+
+        self._logger.info(
+            f"Snapped {snapped_count} cut points to {len(cuts)} scene cuts"
+        )
+        return snapped
+
+    def __merge_segments(self, segments: list[tuple]) -> list[tuple]:
+        merged = []
+        for start, end in segments:
+            if merged and start - merged[-1][1] < self._merge_gap:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+
+        self._logger.info(
+            f"Merged pauses shorter than {self._merge_gap}s: "
+            f"{len(segments)} -> {len(merged)} segments"
+        )
+        return merged
+
+    def __concatenate(self, video, segments: list[tuple]):
+        clips = [video.subclipped(start, end) for start, end in segments]
         final_video = concatenate_videoclips(clips)
 
         self._logger.info(f"New video duration: {round(final_video.duration)}")
 
-        output_path = file_path.replace(".mp4", "_no_pauses.mp4")
-        final_video.write_videofile(output_path, codec="libx264", audio_codec="aac")
-        os.replace(output_path, file_path)
+        return final_video
+
+    @staticmethod
+    def __remap_time(t: float, segments: list[tuple]) -> float:
+        offset = 0
+        for start, end in segments:
+            if t < start:
+                return offset
+            if t <= end:
+                return offset + t - start
+            offset += end - start
+        return offset
+
+    def __is_final_encoded(self, file_path: str) -> bool:
+        metadata = self._media_probe.probe(file_path)
+        codec = ENCODER_CODECS.get(
+            self._encoding_profile.video_codec, self._encoding_profile.video_codec
+        )
+        if (
+            metadata["codec"] == codec
+            and metadata["pixel_format"] == self._encoding_profile.pixel_format
+            and "4:4:4" not in (metadata["profile"] or "")
+        ):
+            return True
+
+        self._logger.warning(
+            f"Stream copy needs a source already encoded as {codec} "
+            f"{self._encoding_profile.pixel_format}, got {metadata['codec']} "
+            f"{metadata['pixel_format']} ({metadata['profile']}); re-encoding instead"
+        )
+        return False
+
+    def __smart_cut(
+        self, file_path: str, subtitles: list, source_path: str, start_time: float
+    ):
+        duration = self._media_probe.duration(file_path)
+        segments = self.__find_segments(
+            duration, subtitles, self.__scene_cuts(source_path, start_time, duration)
+        )
+        keyframes = self._media_probe.keyframes(file_path)
+
+        parts_dir = file_path.replace(".mp4", "_parts")
+        os.makedirs(parts_dir, exist_ok=True)
+        try:
+            parts = []
+            for start, end in segments:
+                parts += self.__cut_segment(file_path, parts_dir, start, end, keyframes)
+
+            copied = sum(1 for part in parts if part.endswith("_copy.ts"))
+            self._logger.info(
+                f"Cut {len(segments)} segments: {copied} stream-copied, "
+                f"{len(parts) - copied} re-encoded parts"
+            )
+
+            list_path = os.path.join(parts_dir, "parts.txt")
+            with open(list_path, "w", encoding="utf-8") as file:
+                file.writelines(f"file '{part}'\n" for part in parts)
+
+            video_path = os.path.join(parts_dir, "video.mp4")
+            self.__run_ffmpeg(
+                ["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy"],
+                video_path,
+            )
+
+            filter_path = os.path.join(parts_dir, "audio_filter.txt")
+            with open(filter_path, "w", encoding="utf-8") as file:
+                file.write(self.__audio_filter(segments))
+
+            output_path = file_path.replace(".mp4", "_no_pauses.mp4")
+            self.__run_ffmpeg(
+                [
+                    "-i",
+                    video_path,
+                    "-i",
+                    file_path,
+                    "-filter_complex_script",
+                    filter_path,
+                    "-map",
+                    "0:v",
+                    "-map",
+                    "[audio]",
+                    "-c:v",
+                    "copy",
+                    *self._encoding_profile.audio_args(),
+                ],
+                output_path,
+            )
+            os.replace(output_path, file_path)
+        finally:
+            shutil.rmtree(parts_dir)
+
+    def __cut_segment(
+        self,
+        file_path: str,
+        parts_dir: str,
+        start: float,
+        end: float,
+        keyframes: list[float],
+    ) -> list[str]:
+        inner_keyframes = [k for k in keyframes if start <= k <= end]
+        if len(inner_keyframes) < 2:
+            return [self.__encode_part(file_path, parts_dir, start, end)]
+
+        first_keyframe, last_keyframe = inner_keyframes[0], inner_keyframes[-1]
+        parts = []
+        if first_keyframe - start > 0.001:
+            parts.append(
+                self.__encode_part(file_path, parts_dir, start, first_keyframe)
+            )
+        parts.append(
+            self.__copy_part(file_path, parts_dir, first_keyframe, last_keyframe)
+        )
+        if end - last_keyframe > 0.001:
+            parts.append(self.__encode_part(file_path, parts_dir, last_keyframe, end))
+        return parts
+
+    def __encode_part(
+        self, file_path: str, parts_dir: str, start: float, end: float
+    ) -> str:
+        part_path = os.path.join(parts_dir, f"{start:011.3f}_encode.ts")
+        self.__run_ffmpeg(
+            [
+                "-ss",
+                f"{start:.3f}",
+                "-i",
+                file_path,
+                "-t",
+                f"{end - start:.3f}",
+                "-an",
+                *self._encoding_profile.video_args(),
+            ],
+            part_path,
+        )
+        return part_path
+
+    def __copy_part(
+        self, file_path: str, parts_dir: str, start: float, end: float
+    ) -> str:
+        part_path = os.path.join(parts_dir, f"{start:011.3f}_copy.ts")
+        self.__run_ffmpeg(
+            [
+                "-ss",
+                f"{start + 0.001:.3f}",
+                "-i",
+                file_path,
+                "-t",
+                f"{end - start:.3f}",
+                "-an",
+                "-c:v",
+                "copy",
+                "-avoid_negative_ts",
+                "make_zero",
+            ],
+            part_path,
+        )
+        return part_path
+
+    @staticmethod
+    def __audio_filter(segments: list[tuple]) -> str:
+        count = len(segments)
+        splits = "".join(f"[s{i}]" for i in range(count))
+        labels = "".join(f"[a{i}]" for i in range(count))
+        trims = ";".join(
+            f"[s{i}]atrim=start={start:.6f}:end={end:.6f},asetpts=PTS-STARTPTS[a{i}]"
+            for i, (start, end) in enumerate(segments)
+        )
+        return (
+            f"[1:a]asplit={count}{splits};{trims};"
+            f"{labels}concat=n={count}:v=0:a=1[audio]"
+        )
+
+    @staticmethod
+    def __run_ffmpeg(arguments: list[str], output_path: str):
+        subprocess.run(
+            ["ffmpeg", "-y", *arguments, output_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
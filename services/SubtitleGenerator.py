@@ -1,13 +1,26 @@
 import json
 import os.path
 import re
+import subprocess
+import threading
+from bisect import bisect_right
+from itertools import groupby
 
+import numpy as np
 import whisper
+from clipsai import Transcription
+
 from abstractions.ISubtitleGenerator import ISubtitleGenerator
 from moviepy import VideoFileClip, CompositeVideoClip, TextClip
 from moviepy.video.fx import CrossFadeIn, CrossFadeOut
+from PIL import ImageColor, ImageFont
 
+from utils.AudioStore import AudioStore
+from utils.EncodingProfile import EncodingProfile
 from utils.Logger import Logger
+from utils.ModelRegistry import ModelRegistry
+from utils.RenderPlan import RenderPlan
+from utils.TranscriptStore import TranscriptStore
 
 
 class SubtitleGenerator(ISubtitleGenerator):
@@ -20,6 +33,12 @@ class SubtitleGenerator(ISubtitleGenerator):
         max_words_per_line: int = None,
         stroke_color: str = None,
         stroke_width: int = None,
+        retranscribe: bool = False,
+        model_registry: ModelRegistry = None,
+        backend: str = "moviepy",
+        audio_store: AudioStore = None,
+        encoding_profile: EncodingProfile = None,
+        transcript_store: TranscriptStore = None,
     ):
         self._max_words_per_line = max_words_per_line
         self._font_path = font_path
@@ -28,10 +47,173 @@ class SubtitleGenerator(ISubtitleGenerator):
         self._stroke_width = stroke_width
         self._logger = logger
         self._device = device
+        self._retranscribe = retranscribe
+        self._model_registry = model_registry or ModelRegistry.shared()
+        self._lock = threading.Lock()
+        self._backend = backend
+        self._audio_store = audio_store
+        self._encoding_profile = encoding_profile or EncodingProfile()
+        self._transcript_store = transcript_store
+
+    def get_params(self) -> dict:
+        return {
+            "font": os.path.basename(self._font_path),
+            "color": self._color,
+            "max_words_per_line": self._max_words_per_line,
+            "stroke_color": self._stroke_color,
+            "stroke_width": self._stroke_width,
+            "backend": self._backend,
+            "encoding": self._encoding_profile.get_params(),
+        }
 
     def add_subtitles(self, file_path: str, subtitles: list):
+        if self._backend == "ass":
+            self.__burn_subtitles(file_path, subtitles)
+            return subtitles
+
+        final_video = self.__compose(VideoFileClip(file_path), subtitles)
+
+        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
+        final_video.write_videofile(
+            filename=temp_file_path,
+            **self._encoding_profile.moviepy_params(temp_file_path),
+        )
+        os.replace(temp_file_path, file_path)
+
+        return subtitles
+
+    def plan_subtitles(self, render_plan: RenderPlan, subtitles: list):
+        if self._backend != "ass":
+            render_plan.add("subtitles", lambda clip: self.__compose(clip, subtitles))
+            return
+
+        def build(clip, time_map) -> str:
+            retimed_subtitles = [
+                ((time_map(start), time_map(end)), text)
+                for (start, end), text in subtitles
+            ]
+            ass_path = self.export_subtitles(
+                render_plan.file_path, retimed_subtitles, clip.size
+            )
+            return self.__ass_filter(ass_path)
+
+        render_plan.add_filter("subtitles", build)
+
+    def export_subtitles(self, file_path: str, subtitles: list, size) -> str:
+        self.__log_format(subtitles)
+
+        base_path = os.path.splitext(file_path)[0]
+        ass_path = f"{base_path}.ass"
+        srt_path = f"{base_path}.srt"
+
+        with open(ass_path, "w", encoding="utf-8") as file:
+            file.write(self.__to_ass(subtitles, size))
+        with open(srt_path, "w", encoding="utf-8") as file:
+            file.write(self.__to_srt(subtitles))
+
+        self._logger.info(f"Subtitles exported to {os.path.basename(ass_path)}")
+        return ass_path
+
+    def __burn_subtitles(self, file_path: str, subtitles: list):
         video = VideoFileClip(file_path)
+        ass_path = self.export_subtitles(file_path, subtitles, video.size)
+        video.close()
+
+        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-i",
+                file_path,
+                "-vf",
+                self.__ass_filter(ass_path),
+                *self._encoding_profile.video_args(),
+                "-c:a",
+                "copy",
+                temp_file_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        os.replace(temp_file_path, file_path)
+
+    def __ass_filter(self, ass_path: str) -> str:
+        fonts_dir = os.path.dirname(os.path.abspath(self._font_path))
+        return (
+            f"ass=filename={self.__escape_filter_value(ass_path)}"
+            f":fontsdir={self.__escape_filter_value(fonts_dir)}"
+        )
+
+    @staticmethod
+    def __escape_filter_value(value: str) -> str:
+        value = os.path.abspath(value).replace("\\", "/")
+        return value.replace(":", "\\:").replace("'", "\\'").replace(",", "\\,")
+
+    def __to_ass(self, subtitles: list, size) -> str:
+        width, height = size
+        font_name = ImageFont.truetype(self._font_path).getname()[0]
+        font_size = int(height * 0.0375)
+        stroke_color = self.__ass_color(self._stroke_color or "black")
+        lines = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "WrapStyle: 0",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, "
+            "OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, "
+            "ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+            "MarginL, MarginR, MarginV, Encoding",
+            f"Style: Default,{font_name},{font_size},{self.__ass_color(self._color)},"
+            f"&H000000FF,{stroke_color},&H00000000,0,0,0,0,100,100,0,0,1,"
+            f"{self._stroke_width or 0},0,5,10,10,10,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, "
+            "Effect, Text",
+        ]
+        for (start, end), text in subtitles:
+            lines.append(
+                f"Dialogue: 0,{self.__ass_time(start)},{self.__ass_time(end)},"
+                f"Default,,0,0,0,,{{\\fad(100,100)}}{text}"
+            )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __to_srt(subtitles: list) -> str:
+        def srt_time(seconds: float) -> str:
+            milliseconds = round(seconds * 1000)
+            hours, milliseconds = divmod(milliseconds, 3600000)
+            minutes, milliseconds = divmod(milliseconds, 60000)
+            secs, milliseconds = divmod(milliseconds, 1000)
+            return f"{hours:02}:{minutes:02}:{secs:02},{milliseconds:03}"
+
+        blocks = [
+            f"{i}\n{srt_time(start)} --> {srt_time(end)}\n{text}\n"
+            for i, ((start, end), text) in enumerate(subtitles, start=1)
+        ]
+        return "\n".join(blocks)
 
+    @staticmethod
+    def __ass_time(seconds: float) -> str:
+        centiseconds = round(seconds * 100)
+        hours, centiseconds = divmod(centiseconds, 360000)
+        minutes, centiseconds = divmod(centiseconds, 6000)
+        secs, centiseconds = divmod(centiseconds, 100)
+        return f"{hours}:{minutes:02}:{secs:02}.{centiseconds:02}"
+
+    @staticmethod
+    def __ass_color(color: str) -> str:
+        red, green, blue = ImageColor.getrgb(color)[:3]
+        return f"&H00{blue:02X}{green:02X}{red:02X}"
+
+    def __log_format(self, subtitles: list):
         self._logger.info(f"Detected {len(subtitles)} subtitles")
         self._logger.info(f"Adding subtitles to video with the following format:")
         self._logger.info(f"Font: {os.path.basename(self._font_path)}")
@@ -41,20 +223,15 @@ class SubtitleGenerator(ISubtitleGenerator):
         if self._stroke_width:
             self._logger.info(f"Stroke width: {self._stroke_width}px")
 
+    def __compose(self, video, subtitles: list):
+        self.__log_format(subtitles)
+
         sub_clips = [
             self.__subtitle_generator(text, start, end, video.size)
             for (start, end), text in subtitles
         ]
 
-        final_video = CompositeVideoClip([video] + sub_clips, size=video.size)
-
-        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
-        final_video.write_videofile(
-            filename=temp_file_path, codec="libx264", audio_codec="aac"
-        )
-        os.replace(temp_file_path, file_path)
-
-        return subtitles
+        return CompositeVideoClip([video] + sub_clips, size=video.size)
 
     def __subtitle_generator(self, txt: str, start: int, end: int, size):
         _, video_height = size
@@ -77,39 +254,126 @@ class SubtitleGenerator(ISubtitleGenerator):
             .with_end(end)
         )
 
-    def generate_subtitles(self, file_path: str) -> list:
-        model = whisper.load_model("turbo")
+    def generate_subtitles(
+        self,
+        file_path: str,
+        transcription: Transcription = None,
+        start_time: float = 0,
+        end_time: float = None,
+        source_path: str = None,
+    ) -> list:
+        if transcription is not None and not self._retranscribe:
+            return self.__slice_transcription(
+                transcription, start_time, end_time, source_path
+            )
+
+        model = self._model_registry.get(
+            "whisper",
+            "turbo",
+            self._device,
+            loader=lambda: whisper.load_model("turbo", device=self._device),
+        )
 
         self._logger.info("Using whisper model turbo")
 
-        result = model.transcribe(
-            file_path,
-            word_timestamps=self._max_words_per_line is not None,
+        audio = file_path
+        if self._audio_store and source_path:
+            self._logger.info("Using shared episode audio")
+            audio = np.asarray(
+                self._audio_store.window(source_path, start_time, end_time)
+            )
+
+        with self._lock:
+            result = model.transcribe(
+                audio,
+                word_timestamps=self._max_words_per_line is not None,
+            )
+
+        if not self._max_words_per_line:
+            return self.__to_subtitles(
+                [[(s["start"], s["end"], s["text"])] for s in result["segments"]]
+            )
+
+        return self.__to_subtitles(
+            [
+                [(w["start"], w["end"], w["word"]) for w in segment.get("words", [])]
+                for segment in result["segments"]
+            ]
+        )
+
+    def __slice_transcription(
+        self,
+        transcription: Transcription,
+        start_time: float,
+        end_time: float,
+        source_path: str = None,
+    ) -> list:
+        if end_time is None:
+            end_time = transcription.end_time
+
+        self._logger.info(
+            f"Slicing episode transcription to {start_time:.2f}-{end_time:.2f}"
         )
 
+        words = (
+            self._transcript_store.words(source_path, start_time, end_time)
+            if self._transcript_store and source_path
+            else None
+        )
+        if words is not None:
+            sentences = groupby(words, key=lambda word: word["sentence_id"])
+        else:
+            words = [
+                word
+                for word in transcription.get_word_info()
+                if start_time <= word["start_time"] and word["end_time"] <= end_time
+            ]
+            sentence_starts = [
+                sentence["start_char"] for sentence in transcription.get_sentence_info()
+            ]
+            sentences = groupby(
+                words,
+                key=lambda word: bisect_right(sentence_starts, word["start_char"]),
+            )
+
+        return self.__to_subtitles(
+            [
+                [
+                    (
+                        word["start_time"] - start_time,
+                        word["end_time"] - start_time,
+                        word["word"],
+                    )
+                    for word in sentence_words
+                ]
+                for _, sentence_words in sentences
+            ]
+        )
+
+    def __to_subtitles(self, segments: list[list[tuple]]) -> list:
         subtitles = []
 
         if not self._max_words_per_line:
-            for segment in result["segments"]:
-                start = segment["start"]
-                end = segment["end"]
-                text = re.sub(r"[^\w\s]", "", segment["text"])
+            for words in segments:
+                if not words:
+                    continue
+                start = words[0][0]
+                end = words[-1][1]
+                text = " ".join(
+                    re.sub(r"[^\w\s]", "", text).strip() for _, _, text in words
+                )
                 subtitles.append(((start, end), text))
             return subtitles
 
         self._logger.info(f"Max words per line: {self._max_words_per_line}")
 
-        for segment in result["segments"]:
-            words = segment.get("words", [])
-            if not words:
-                continue
-
+        for words in segments:
             for i in range(0, len(words), self._max_words_per_line):
                 word_chunk = words[i : i + self._max_words_per_line]
-                start = word_chunk[0]["start"]
-                end = word_chunk[-1]["end"]
+                start = word_chunk[0][0]
+                end = word_chunk[-1][1]
                 text = " ".join(
-                    re.sub(r"[^\w\s]", "", word["word"]) for word in word_chunk
+                    re.sub(r"[^\w\s]", "", text).strip() for _, _, text in word_chunk
                 )
                 subtitles.append(((start, end), text))
 
@@ -117,8 +381,10 @@ class SubtitleGenerator(ISubtitleGenerator):
 
     def save_to_file(self, file_path: str, subtitles: list):
         try:
-            with open(file_path, "x", encoding="utf-8") as file:
+            temp_file_path = f"{file_path}.temp"
+            with open(temp_file_path, "w", encoding="utf-8") as file:
                 json.dump(subtitles, file, indent=4, ensure_ascii=False)
+            os.replace(temp_file_path, file_path)
             print(f"Subtitles successfully saved to {file_path}")
         except Exception as e:
             print(f"Error saving subtitles to file: {str(e)}")
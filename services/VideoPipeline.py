@@ -1,15 +1,27 @@
 import os
+import threading
 import traceback
 
+from clipsai import Clip, Crops, Transcription
+from clipsai.filesys.json_file import JSONFile
+
 from abstractions.IBackgroundGenerator import IBackgroundGenerator
 from abstractions.IFrameRateReducer import IFrameRateReducer
 from abstractions.IPauseRemover import IPauseRemover
+from abstractions.IRenderer import IRenderer
 from abstractions.ISubtitleGenerator import ISubtitleGenerator
 from abstractions.IVideoResizer import IVideoResizer
 from abstractions.IVideoScaler import IVideoScaler
 from abstractions.IVideoTranscriber import IVideoTranscriber
 from abstractions.IVideoTrimmer import IVideoTrimmer
 from utils.Logger import Logger
+from utils.Manifest import Manifest
+from utils.MediaProbe import MediaProbe
+from utils.RenderPlan import RenderPlan
+from utils.StageCache import StageCache
+from utils.StageGraph import StageGraph
+from utils.TranscriptStore import TranscriptStore
+from utils.utils import RESULTS_PATH
 
 
 class VideoPipeline:
@@ -24,6 +36,11 @@ class VideoPipeline:
         subtitle_generator: ISubtitleGenerator,
         pause_remover: IPauseRemover,
         logger: Logger,
+        renderer: IRenderer = None,
+        stage_cache: StageCache = None,
+        resume: bool = False,
+        concurrent: bool = False,
+        transcript_store: TranscriptStore = None,
     ):
         self._frame_rate_reducer = frame_rate_reducer
         self._video_transcriber = video_transcriber
@@ -34,43 +51,415 @@ class VideoPipeline:
         self._subtitle_generator = subtitle_generator
         self._pause_remover = pause_remover
         self._logger = logger
+        self._renderer = renderer
+        self._stage_cache = stage_cache
+        self._resume = resume
+        self._concurrent = concurrent
+        self._transcript_store = transcript_store
+        self._manifests = {}
+        self._manifests_lock = threading.Lock()
 
     def process_video(self, file_path: str) -> None:
         try:
+            transcription = self.transcribe_video(file_path)
+            episode_crops = self.crop_video(file_path)
+            clips = self.trim_video(file_path, transcription)
+            for i, (clip, clip_path) in enumerate(clips, start=1):
+                self._logger.log_progress(
+                    subtitle=f"Processing clip ({i}/{len(clips)}) {os.path.basename(clip_path)}"
+                )
+                self.process_clip(
+                    clip_path, clip, transcription, episode_crops, file_path
+                )
+        except Exception as e:
+            self._logger.error(f"Video processing pipeline failed: {str(e)}")
+            self._logger.debug(traceback.format_exc())
+
+    def transcribe_video(self, file_path: str) -> Transcription:
+        if not self._renderer:
             self._logger.log_progress(stage=f"Reducing frame rate")
             self._frame_rate_reducer.reduce(file_path)
 
-            self._logger.log_progress(stage=f"Transcribing")
-            transcription = self._video_transcriber.transcribe(
-                file_path, iso6391_lang_code="ru"
-            )
+        self._logger.log_progress(stage=f"Transcribing")
+        params = {**self._video_transcriber.get_params(), "language": "ru"}
+        if self._transcript_store:
+            transcription = self._transcript_store.load(file_path, params)
+            if transcription is not None:
+                self._logger.info("Transcription loaded from transcript store")
+                return transcription
+
+        transcription = self.__transcribe(file_path, params)
+        if self._transcript_store:
+            self._transcript_store.save(file_path, transcription, params)
+        return transcription
+
+    def crop_video(self, file_path: str) -> Crops or None:
+        self._logger.log_progress(stage=f"Planning episode crops")
+        return self._video_resizer.plan_episode(file_path)
 
-            self._logger.log_progress(stage=f"Trimming into clips")
-            clips = self._video_trimmer.trim_clips(transcription, file_path)
-            # for i, clip in enumerate(clips, start=1):
-            # try:
-            # self._logger.log_progress(
-            #     subtitle=f"Processing clip ({i}/{len(clips)}) {os.path.basename(clip)}",
-            #     stage=f"Resizing",
-            # )
-            # self._video_resizer.resize(clip)
-            #
-            # self._logger.log_progress(stage=f"Adding background")
-            # self._background_generator.add_background(clip)
-            #
-            # self._logger.log_progress(stage=f"Scaling")
-            # self._video_scaler.scale(clip)
-            #
-            # self._logger.log_progress(stage=f"Generating subtitles")
-            # subtitles = self._subtitle_generator.generate_subtitles(clip)
-            #
-            # self._logger.log_progress(stage=f"Adding subtitles")
-            # self._subtitle_generator.add_subtitles(clip, subtitles)
-            #
-            # self._logger.log_progress(stage=f"Removing pauses")
-            # self._pause_remover.remove_pauses(clip, subtitles)
-
-            # except Exception as e:
-            #     self._logger.error(f"Clip {clip} processing failed: {str(e)}")
+    def trim_video(
+        self, file_path: str, transcription: Transcription
+    ) -> list[tuple[Clip, str]]:
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        manifest = self.__manifest(os.path.join(RESULTS_PATH, video_name))
+        if self._resume and manifest.source == file_path:
+            clips = manifest.clips()
+            if clips and all(os.path.exists(clip_path) for _, clip_path in clips):
+                self._logger.info(f"Resuming {len(clips)} clips from {manifest.path}")
+                return clips
+
+        self._logger.log_progress(stage=f"Trimming into clips")
+        clips = self._video_trimmer.find_clips(transcription, file_path)
+        clips = self._video_trimmer.snap_clips(clips, file_path)
+        clip_paths = self._video_trimmer.trim(clips, file_path)
+        clips = list(zip(clips, clip_paths))
+        manifest.set_clips(file_path, clips)
+        return clips
+
+    def process_clip(
+        self,
+        clip_path: str,
+        clip: Clip,
+        transcription: Transcription,
+        episode_crops: Crops = None,
+        source_path: str = None,
+    ) -> bool:
+        manifest = self.__manifest(os.path.dirname(clip_path))
+        if not manifest.has_clip(clip_path):
+            manifest = None
+        elif source_path is None:
+            source_path = manifest.source
+        elif self._resume and manifest.status(clip_path) == "done":
+            self._logger.info(f"Clip {os.path.basename(clip_path)} already processed")
+            return True
+
+        try:
+            crops = None
+            if episode_crops:
+                crops = self._video_resizer.clip_crops(
+                    episode_crops, clip.start_time, clip.end_time
+                )
+            if manifest:
+                self.__checkpoint_clip(manifest, clip_path, clip)
+            if self._renderer:
+                self.__render_clip(
+                    clip_path, clip, source_path, transcription, crops, manifest
+                )
+            else:
+                self.__process_clip(
+                    clip_path, clip, source_path, transcription, crops, manifest
+                )
+            if manifest:
+                manifest.finish_clip(clip_path)
+            return True
         except Exception as e:
-            self._logger.error(f"Video processing pipeline failed: {str(e)}")
+            self._logger.error(f"Clip {clip_path} processing failed: {str(e)}")
+            self._logger.debug(traceback.format_exc())
+            if manifest:
+                manifest.fail_clip(clip_path, str(e))
+            return False
+
+    def __transcribe(self, file_path: str, params: dict) -> Transcription:
+        if not self._stage_cache:
+            return self._video_transcriber.transcribe(file_path, iso6391_lang_code="ru")
+
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        transcription_path = os.path.join(
+            RESULTS_PATH, video_name, "transcription.json"
+        )
+        os.makedirs(os.path.dirname(transcription_path), exist_ok=True)
+        key = self._stage_cache.key("transcription", file_path, params)
+        if self._stage_cache.restore(key, transcription_path):
+            self._logger.info("Transcription restored from cache")
+            return Transcription(JSONFile(transcription_path))
+
+        transcription = self._video_transcriber.transcribe(
+            file_path, iso6391_lang_code="ru"
+        )
+        transcription.store_as_json_file(transcription_path)
+        self._stage_cache.store(key, transcription_path)
+        return transcription
+
+    def __manifest(self, folder: str) -> Manifest:
+        with self._manifests_lock:
+            if folder not in self._manifests:
+                self._manifests[folder] = Manifest(folder)
+            return self._manifests[folder]
+
+    def __checkpoint_clip(self, manifest: Manifest, clip_path: str, clip: Clip):
+        if not self._resume or manifest.verify(clip_path):
+            stages = manifest.completed_stages(clip_path)
+            if len(stages) > 1:
+                self._logger.info(f"Resuming after '{stages[-1]}'")
+            manifest.start_clip(clip_path)
+            return
+
+        self._logger.warning(
+            f"{os.path.basename(clip_path)} does not match its last checkpoint, "
+            f"trimming it again"
+        )
+        self._video_trimmer.trim([clip], manifest.source)
+        manifest.restart_clip(clip_path)
+
+    def __process_clip(
+        self,
+        clip_path: str,
+        clip: Clip,
+        source_path: str,
+        transcription: Transcription,
+        crops: Crops = None,
+        manifest: Manifest = None,
+    ):
+        def file_stage(stage: str, params, action):
+            def run(*inputs):
+                stage_params = params(*inputs[1:]) if callable(params) else params
+                self.__run_stage(
+                    stage, clip_path, stage_params, lambda: action(*inputs), manifest
+                )
+                return clip_path
+
+            return run
+
+        graph = StageGraph(self._logger)
+        graph.add(
+            "frame rate",
+            file_stage(
+                "frame rate",
+                self._frame_rate_reducer.get_params(),
+                self._frame_rate_reducer.reduce_clip,
+            ),
+            inputs=("clip",),
+            title="Reducing frame rate",
+        )
+        crops_input = "clip crops"
+        crops_source = None
+        if (
+            crops is None
+            and self._concurrent
+            and not self.__is_resized(clip_path, manifest)
+        ):
+            crops_source = clip_path.replace(".mp4", "_crops_source.mp4")
+            if os.path.exists(crops_source):
+                os.remove(crops_source)
+            os.link(clip_path, crops_source)
+            graph.add(
+                "crops",
+                lambda: self._video_resizer.find_crops(
+                    crops_source, source_path, clip.start_time
+                ),
+                title="Finding crops",
+            )
+            crops_input = "crops"
+        graph.add(
+            "resize",
+            file_stage(
+                "resize",
+                self._video_resizer.get_params(),
+                lambda path, clip_crops: self._video_resizer.resize(path, clip_crops),
+            ),
+            inputs=("frame rate", crops_input),
+            title="Resizing",
+        )
+        graph.add(
+            "background",
+            file_stage(
+                "background",
+                self._background_generator.get_params(),
+                self._background_generator.add_background,
+            ),
+            inputs=("resize",),
+            title="Adding background",
+        )
+        graph.add(
+            "scale",
+            file_stage(
+                "scale", self._video_scaler.get_params(), self._video_scaler.scale
+            ),
+            inputs=("background",),
+            title="Scaling",
+        )
+        graph.add(
+            "subtitle list",
+            lambda: self._subtitle_generator.generate_subtitles(
+                clip_path,
+                transcription,
+                clip.start_time,
+                clip.end_time,
+                source_path=source_path,
+            ),
+            title="Generating subtitles",
+        )
+        graph.add(
+            "subtitles",
+            file_stage(
+                "subtitles",
+                lambda subtitles: {
+                    **self._subtitle_generator.get_params(),
+                    "subtitles": subtitles,
+                },
+                self._subtitle_generator.add_subtitles,
+            ),
+            inputs=("scale", "subtitle list"),
+            title="Adding subtitles",
+        )
+        graph.add(
+            "pauses",
+            file_stage(
+                "pauses",
+                lambda subtitles: {
+                    **self._pause_remover.get_params(),
+                    "subtitles": subtitles,
+                },
+                lambda path, subtitles: self._pause_remover.remove_pauses(
+                    path, subtitles, source_path, clip.start_time
+                ),
+            ),
+            inputs=("subtitles", "subtitle list"),
+            title="Removing pauses",
+        )
+        try:
+            graph.run(
+                {"clip": clip_path, "clip crops": crops}, concurrent=self._concurrent
+            )
+        finally:
+            if crops_source and os.path.exists(crops_source):
+                os.remove(crops_source)
+
+    def __render_clip(
+        self,
+        clip_path: str,
+        clip: Clip,
+        source_path: str,
+        transcription: Transcription,
+        crops: Crops = None,
+        manifest: Manifest = None,
+    ):
+        def render_params(subtitles: list) -> dict:
+            return {
+                "frame_rate": self._frame_rate_reducer.get_params(),
+                "resize": self._video_resizer.get_params(),
+                "background": self._background_generator.get_params(),
+                "scale": self._video_scaler.get_params(),
+                "subtitles": self._subtitle_generator.get_params(),
+                "pauses": self._pause_remover.get_params(),
+                "renderer": self._renderer.get_params(),
+                "subtitle_list": subtitles,
+            }
+
+        def render(crops: Crops, subtitles: list):
+            self.__run_stage(
+                "render",
+                clip_path,
+                render_params(subtitles),
+                lambda: self.__render(
+                    clip_path, subtitles, crops, source_path, clip.start_time
+                ),
+                manifest,
+            )
+
+        graph = StageGraph(self._logger)
+        graph.add(
+            "subtitle list",
+            lambda: self._subtitle_generator.generate_subtitles(
+                clip_path,
+                transcription,
+                clip.start_time,
+                clip.end_time,
+                source_path=source_path,
+            ),
+            title="Generating subtitles",
+        )
+        crops_input = "clip crops"
+        if crops is None and self._concurrent:
+            graph.add(
+                "crops",
+                lambda path, subtitles: (
+                    None
+                    if self.__is_rendered(path, render_params(subtitles), manifest)
+                    else self._video_resizer.find_crops(
+                        path, source_path, clip.start_time
+                    )
+                ),
+                inputs=("clip", "subtitle list"),
+                title="Finding crops",
+            )
+            crops_input = "crops"
+        graph.add(
+            "render",
+            render,
+            inputs=(crops_input, "subtitle list"),
+            title="Rendering clip",
+        )
+        graph.run({"clip": clip_path, "clip crops": crops}, concurrent=self._concurrent)
+
+    def __render(
+        self,
+        clip_path: str,
+        subtitles: list,
+        crops: Crops = None,
+        source_path: str = None,
+        start_time: float = 0,
+    ):
+        plan = RenderPlan(clip_path)
+
+        self._logger.info("Planning render")
+        self._frame_rate_reducer.plan_reduce(plan)
+        self._video_resizer.plan_resize(plan, crops)
+        self._background_generator.plan_background(plan)
+        self._video_scaler.plan_scale(plan)
+        self._subtitle_generator.plan_subtitles(plan, subtitles)
+        self._pause_remover.plan_pause_removal(plan, subtitles, source_path, start_time)
+
+        self._renderer.render(plan)
+
+    def __is_resized(self, clip_path: str, manifest: Manifest = None) -> bool:
+        completed = manifest.completed_stages(clip_path) if manifest else []
+        if "resize" in completed:
+            return True
+        if not self._stage_cache:
+            return False
+
+        resize_input = clip_path
+        if "frame rate" not in completed:
+            resize_input = self._stage_cache.lookup(
+                "frame rate", clip_path, self._frame_rate_reducer.get_params()
+            )
+        return bool(
+            resize_input
+            and self._stage_cache.lookup(
+                "resize", resize_input, self._video_resizer.get_params()
+            )
+        )
+
+    def __is_rendered(
+        self, clip_path: str, params: dict, manifest: Manifest = None
+    ) -> bool:
+        if manifest and "render" in manifest.completed_stages(clip_path):
+            return True
+        return bool(
+            self._stage_cache and self._stage_cache.lookup("render", clip_path, params)
+        )
+
+    def __run_stage(
+        self,
+        stage: str,
+        file_path: str,
+        params: dict,
+        action,
+        manifest: Manifest = None,
+    ):
+        if manifest and stage in manifest.completed_stages(file_path):
+            self._logger.info(f"'{stage}' already applied, skipping")
+            return
+
+        if self._stage_cache:
+            restored = self._stage_cache.run(stage, file_path, params, action)
+        else:
+            action()
+            restored = False
+
+        if manifest:
+            manifest.complete_stage(file_path, stage)
+        if not restored:
+            metadata = MediaProbe.shared().probe(file_path)
+            self._logger.count_frames(round(metadata["duration"] * metadata["fps"]))
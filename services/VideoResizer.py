@@ -1,26 +1,35 @@
+import json
+import logging
 import os
-from contextlib import contextmanager
-from clipsai import MediaEditor, AudioVideoFile, Crops, resize
+import threading
+
+import numpy as np
+import torch
+from clipsai import MediaEditor, AudioVideoFile, Crops, Segment
+from clipsai.diarize.pyannote import PyannoteDiarizer
+from clipsai.resize.resizer import Resizer
+from clipsai.resize.vid_proc import detect_scenes
+from facenet_pytorch import MTCNN
 
 from abstractions.IVideoResizer import IVideoResizer
+from utils.AudioStore import AudioStore
+from utils.EncodingProfile import EncodingProfile
+from utils.FaceTracker import FaceTracker
 from utils.Logger import Logger
-from utils.utils import PYANNOTE_TOKEN
+from utils.ModelRegistry import ModelRegistry
+from utils.RenderPlan import RenderPlan
+from utils.SceneIndex import SceneIndex
+from utils.utils import PYANNOTE_TOKEN, RESULTS_PATH
 
 
-@contextmanager
-def suppress_output():
-    with open(os.devnull, "w") as devnull:
-        stdout_fd = os.dup(1)
-        stderr_fd = os.dup(2)
-        try:
-            os.dup2(devnull.fileno(), 1)
-            os.dup2(devnull.fileno(), 2)
-            yield
-        finally:
-            os.dup2(stdout_fd, 1)
-            os.dup2(stderr_fd, 2)
-            os.close(stdout_fd)
-            os.close(stderr_fd)
+QUIET_LOGGERS = (
+    "pyannote",
+    "pyscenedetect",
+    "speechbrain",
+    "pytorch_lightning",
+    "lightning",
+    "lightning_fabric",
+)
 
 
 class VideoResizer(IVideoResizer):
@@ -31,45 +40,298 @@ class VideoResizer(IVideoResizer):
         face_margin: int,
         aspect_ratio: tuple[int, int],
         device: str,
+        model_registry: ModelRegistry = None,
+        sparse: bool = False,
+        sample_fps: float = 3,
+        detect_width: int = 480,
+        static_threshold: float = 2.0,
+        dead_band: float = 0.05,
+        min_segment_duration: float = 1.0,
+        episode_crops: bool = False,
+        encoding_profile: EncodingProfile = None,
+        scene_index: SceneIndex = None,
+        audio_store: AudioStore = None,
     ):
         self._media_editor = media_editor
         self._logger = logger
         self._face_margin = face_margin
         self._aspect_ratio = aspect_ratio
         self._device = device
+        self._model_registry = model_registry or ModelRegistry.shared()
+        self._lock = threading.Lock()
+        self._sparse = sparse
+        self._sample_fps = sample_fps
+        self._detect_width = detect_width
+        self._static_threshold = static_threshold
+        self._dead_band = dead_band
+        self._min_segment_duration = min_segment_duration
+        self._episode_crops = episode_crops
+        self._encoding_profile = encoding_profile or EncodingProfile()
+        self._scene_index = scene_index
+        self._audio_store = audio_store
+
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    def get_params(self) -> dict:
+        params = {
+            "face_margin": self._face_margin,
+            "aspect_ratio": self._aspect_ratio,
+            "encoding": self._encoding_profile.get_params(),
+        }
+        if self._sparse:
+            params.update(
+                sparse=True,
+                sample_fps=self._sample_fps,
+                detect_width=self._detect_width,
+                static_threshold=self._static_threshold,
+                dead_band=self._dead_band,
+                min_segment_duration=self._min_segment_duration,
+            )
+        if self._scene_index:
+            params.update(scenes=self._scene_index.get_params())
+        if self._episode_crops:
+            params.update(episode_crops=True)
+        return params
 
-    def resize(self, file_path: str):
+    def resize(self, file_path: str, crops: Crops = None):
         media_file = AudioVideoFile(file_path)
 
         self._logger.info(f"Resizing video to {self._aspect_ratio}")
         self._logger.info(f"Face margin: {self._face_margin}px")
 
-        with suppress_output():
-            crops = self.__calculate_crops(
-                file_path=file_path,
-                original_width=media_file.get_width_pixels(),
+        if crops is None:
+            crops = self.find_crops(file_path)
+
+        temp_file_path = file_path.replace(".mp4", "_temp.mp4")
+        self._media_editor.resize_video(
+            original_video_file=media_file,
+            resized_video_file_path=temp_file_path,
+            width=crops.crop_width,
+            height=crops.crop_height,
+            segments=crops.to_dict()["segments"],
+            **self._encoding_profile.media_editor_params(),
+        )
+        os.replace(temp_file_path, file_path)
+
+    def plan_resize(self, render_plan: RenderPlan, crops: Crops = None):
+        self._logger.info(f"Planning crops for {self._aspect_ratio}")
+        self._logger.info(f"Face margin: {self._face_margin}px")
+
+        if crops is None:
+            crops = self.find_crops(render_plan.file_path)
+
+        self._logger.info(f"Crop segments: {len(crops.segments)}")
+        render_plan.add("crop", lambda clip: self.__crop_clip(clip, crops))
+
+    def find_crops(
+        self, file_path: str, source_path: str = None, start_time: float = 0
+    ) -> Crops:
+        media_file = AudioVideoFile(file_path)
+        return self.__calculate_crops(
+            file_path=file_path,
+            original_width=media_file.get_width_pixels(),
+            source_path=source_path,
+            start_time=start_time,
+        )
+
+    def plan_episode(self, file_path: str) -> Crops or None:
+        if not self._episode_crops:
+            return None
+
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        crops_path = os.path.join(RESULTS_PATH, video_name, "crops.json")
+        stat = os.stat(file_path)
+        source = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        params = json.loads(json.dumps(self.get_params()))
+
+        if os.path.exists(crops_path):
+            with open(crops_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data["source"] == source and data["params"] == params:
+                self._logger.info(f"Loaded episode crops from {crops_path}")
+                return self.__crops_from_dict(data["crops"])
+
+        self._logger.info("Calculating crops for the whole episode")
+        crops = self.find_crops(file_path, source_path=file_path)
+
+        os.makedirs(os.path.dirname(crops_path), exist_ok=True)
+        temp_crops_path = f"{crops_path}.temp"
+        with open(temp_crops_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"source": source, "params": params, "crops": crops.to_dict()}, file
             )
-            temp_file_path = file_path.replace(".mp4", "_temp.mp4")
-
-            self._media_editor.resize_video(
-                original_video_file=media_file,
-                resized_video_file_path=temp_file_path,
-                width=crops.crop_width,
-                height=crops.crop_height,
-                segments=crops.to_dict()["segments"],
+        os.replace(temp_crops_path, crops_path)
+
+        self._logger.info(f"Episode crops: {len(crops.segments)} segments")
+        return crops
+
+    @staticmethod
+    def clip_crops(episode_crops: Crops, start_time: float, end_time: float) -> Crops:
+        segments = [
+            Segment(
+                speakers=segment.speakers,
+                start_time=max(segment.start_time, start_time) - start_time,
+                end_time=min(segment.end_time, end_time) - start_time,
+                x=segment.x,
+                y=segment.y,
             )
+            for segment in episode_crops.segments
+            if segment.end_time > start_time and segment.start_time < end_time
+        ]
+        if not segments:
+            x = (episode_crops.original_width - episode_crops.crop_width) // 4 * 2
+            y = (episode_crops.original_height - episode_crops.crop_height) // 4 * 2
+            segments = [Segment([], 0, end_time - start_time, x, y)]
+        return Crops(
+            episode_crops.original_width,
+            episode_crops.original_height,
+            episode_crops.crop_width,
+            episode_crops.crop_height,
+            segments,
+        )
 
-            os.replace(temp_file_path, file_path)
+    def __scene_cuts(
+        self, file_path: str, source_path: str = None, start_time: float = 0
+    ):
+        if not self._scene_index:
+            return None
+        if not source_path:
+            return self._scene_index.detect(file_path)
+        cuts = self._scene_index.load(source_path)
+        if source_path == file_path:
+            return cuts
+        duration = AudioVideoFile(file_path).get_duration()
+        return SceneIndex.window(cuts, start_time, start_time + duration)
+
+    def __diarize_stored(
+        self,
+        diarizer: PyannoteDiarizer,
+        media: AudioVideoFile,
+        source_path: str,
+        start_time: float,
+    ) -> list[dict]:
+        duration = media.get_duration()
+        audio = self._audio_store.window(source_path, start_time, start_time + duration)
+        waveform = torch.from_numpy(np.array(audio, dtype=np.float32)).unsqueeze(0)
+        annotation = diarizer.pipeline(
+            {"waveform": waveform, "sample_rate": AudioStore.SAMPLE_RATE}
+        )
+        return diarizer._adjust_segments(
+            pyannote_segments=annotation,
+            min_segment_duration=1.5,
+            duration=duration,
+            time_precision=6,
+        )
+
+    @staticmethod
+    def __crops_from_dict(data: dict) -> Crops:
+        return Crops(
+            data["original_width"],
+            data["original_height"],
+            data["crop_width"],
+            data["crop_height"],
+            [Segment(**segment) for segment in data["segments"]],
+        )
+
+    @staticmethod
+    def __crop_clip(clip, crops: Crops):
+        segments = crops.segments
+        width, height = crops.crop_width, crops.crop_height
+
+        def crop(get_frame, t):
+            segment = next((s for s in segments if t < s.end_time), segments[-1])
+            frame = get_frame(t)
+            return frame[segment.y : segment.y + height, segment.x : segment.x + width]
+
+        return clip.transform(crop)
 
     def __calculate_crops(
         self,
         file_path: str,
         original_width: int,
+        source_path: str = None,
+        start_time: float = 0,
     ) -> Crops:
-        return resize(
-            video_file_path=file_path,
-            pyannote_auth_token=PYANNOTE_TOKEN,
-            face_detect_width=original_width,
-            face_detect_margin=self._face_margin,
+        media = AudioVideoFile(file_path)
+        media.assert_has_audio_stream()
+        media.assert_has_video_stream()
+
+        with self._lock:
+            if self._sparse:
+                return self.__track_crops(file_path, source_path, start_time)
+            return self.__detect_crops(media, original_width, source_path, start_time)
+
+    def __track_crops(
+        self, file_path: str, source_path: str = None, start_time: float = 0
+    ) -> Crops:
+        face_detector = self._model_registry.get(
+            "mtcnn-detector",
+            f"margin-{self._face_margin}",
+            self._device,
+            loader=lambda: MTCNN(
+                margin=self._face_margin, post_process=False, device=self._device
+            ),
+        )
+        face_tracker = FaceTracker(
+            face_detector,
+            sample_fps=self._sample_fps,
+            detect_width=self._detect_width,
+            static_threshold=self._static_threshold,
+            dead_band=self._dead_band,
+            min_segment_duration=self._min_segment_duration,
+        )
+        crops = face_tracker.track(
+            file_path,
+            self._aspect_ratio,
+            self.__scene_cuts(file_path, source_path, start_time),
+        )
+        self._logger.info(
+            f"Face detection on {face_tracker.detected_frames} sampled frames, "
+            f"skipped {face_tracker.skipped_frames} static ones"
+        )
+        return crops
+
+    def __detect_crops(
+        self,
+        media: AudioVideoFile,
+        original_width: int,
+        source_path: str = None,
+        start_time: float = 0,
+    ) -> Crops:
+        diarizer = self._model_registry.get(
+            "pyannote",
+            "speaker-diarization-3.1",
+            self._device,
+            loader=lambda: PyannoteDiarizer(
+                auth_token=PYANNOTE_TOKEN, device=self._device
+            ),
+        )
+        if self._audio_store and source_path:
+            speaker_segments = self.__diarize_stored(
+                diarizer, media, source_path, start_time
+            )
+        else:
+            speaker_segments = diarizer.diarize(media, min_segment_duration=1.5)
+        if self._scene_index:
+            scene_changes = self.__scene_cuts(
+                media.path, source_path, start_time
+            ).tolist()
+        else:
+            scene_changes = detect_scenes(media, min_scene_duration=0.25)
+
+        resizer = self._model_registry.get(
+            "mtcnn",
+            f"margin-{self._face_margin}",
+            self._device,
+            loader=lambda: Resizer(
+                face_detect_margin=self._face_margin, device=self._device
+            ),
+        )
+        return resizer.resize(
+            video_file=media,
+            speaker_segments=speaker_segments,
+            scene_changes=scene_changes,
             aspect_ratio=self._aspect_ratio,
+            face_detect_width=original_width,
         )
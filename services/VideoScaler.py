@@ -1,16 +1,77 @@
 import os
+import queue
 import shutil
 import subprocess
+import threading
 
 import cv2
+import numpy as np
 import torch
 from moviepy import VideoFileClip
 from realesrgan import RealESRGANer
 
 from abstractions.IVideoScaler import IVideoScaler
+from utils.EncodingProfile import EncodingProfile
 from utils.Logger import Logger
+from utils.ModelRegistry import ModelRegistry
+from utils.RenderPlan import RenderPlan
 from utils.utils import RESULTS_PATH
+from utils.TileUpscaler import TileUpscaler
 from basicsr.archs.rrdbnet_arch import RRDBNet
+from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+
+RELEASES_URL = "https://github.com/xinntao/Real-ESRGAN/releases/download"
+
+MODELS = {
+    "x4plus": (
+        lambda: RRDBNet(
+            num_in_ch=3,
+            num_out_ch=3,
+            num_feat=64,
+            num_block=23,
+            num_grow_ch=32,
+            scale=4,
+        ),
+        4,
+        f"{RELEASES_URL}/v0.1.0/RealESRGAN_x4plus.pth",
+    ),
+    "x2plus": (
+        lambda: RRDBNet(
+            num_in_ch=3,
+            num_out_ch=3,
+            num_feat=64,
+            num_block=23,
+            num_grow_ch=32,
+            scale=2,
+        ),
+        2,
+        f"{RELEASES_URL}/v0.2.1/RealESRGAN_x2plus.pth",
+    ),
+    "general-x4v3": (
+        lambda: SRVGGNetCompact(
+            num_in_ch=3,
+            num_out_ch=3,
+            num_feat=64,
+            num_conv=32,
+            upscale=4,
+            act_type="prelu",
+        ),
+        4,
+        f"{RELEASES_URL}/v0.2.5.0/realesr-general-x4v3.pth",
+    ),
+    "animevideov3": (
+        lambda: SRVGGNetCompact(
+            num_in_ch=3,
+            num_out_ch=3,
+            num_feat=64,
+            num_conv=16,
+            upscale=4,
+            act_type="prelu",
+        ),
+        4,
+        f"{RELEASES_URL}/v0.2.5.0/realesr-animevideov3.pth",
+    ),
+}
 
 
 class VideoScaler(IVideoScaler):
@@ -19,47 +80,141 @@ class VideoScaler(IVideoScaler):
         logger: Logger,
         target_width: int = 1080,
         ai: bool = True,
+        model_registry: ModelRegistry = None,
+        streaming: bool = False,
+        queue_size: int = 32,
+        device: str = "cpu",
+        model_name: str = "x4plus",
+        tile_size: int = 0,
+        tile_overlap: int = 10,
+        batch_size: int = 1,
+        workers: int = 1,
+        reuse_threshold: float = None,
+        encoding_profile: EncodingProfile = None,
     ):
+        if not tile_size and (workers > 1 or batch_size > 1):
+            raise ValueError(
+                f"workers={workers} and batch_size={batch_size} require tiling, "
+                f"set tile_size > 0"
+            )
+
         self.target_width = target_width
         self.ai = ai
         self.logger = logger
+        self.model_registry = model_registry or ModelRegistry.shared()
+        self.streaming = streaming
+        self.queue_size = queue_size
+        self.device = device
+        self.model_name = model_name
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.batch_size = batch_size
+        self.workers = workers
+        self.reuse_threshold = reuse_threshold
+        self.encoding_profile = encoding_profile or EncodingProfile()
 
-        if ai:
-            model = RRDBNet(
-                num_in_ch=3,
-                num_out_ch=3,
-                num_feat=64,
-                num_block=23,
-                num_grow_ch=32,
-                scale=4,
-            )
-            netscale = 4
-            model_url = "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth"
-
-            self.scaler = RealESRGANer(
-                scale=netscale,
-                model_path=model_url,
-                model=model,
-                device=torch.device("cuda"),
+    @property
+    def scaler(self) -> RealESRGANer:
+        return self.model_registry.get(
+            "realesrgan",
+            self.model_name,
+            self.device,
+            f"tile-{self.tile_size}-{self.tile_overlap}",
+            loader=self.__load_scaler,
+        )
+
+    @property
+    def tile_upscaler(self) -> TileUpscaler:
+        return self.model_registry.get(
+            "realesrgan-tiled",
+            self.model_name,
+            self.device,
+            f"tile-{self.tile_size}-{self.tile_overlap}-{self.batch_size}-{self.workers}",
+            loader=lambda: TileUpscaler(
+                model=self.scaler.model,
+                scale=self.scaler.scale,
+                device=self.device,
+                tile_size=self.tile_size,
+                tile_overlap=self.tile_overlap,
+                batch_size=self.batch_size,
+                workers=self.workers,
+            ),
+        )
+
+    def __load_scaler(self) -> RealESRGANer:
+        build_model, netscale, model_url = MODELS[self.model_name]
+
+        if self.device == "cpu":
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.workers))
+
+        return RealESRGANer(
+            scale=netscale,
+            model_path=model_url,
+            model=build_model(),
+            tile=self.tile_size,
+            tile_pad=self.tile_overlap,
+            device=torch.device(self.device),
+        )
+
+    def __frame_upscaler(self):
+        if self.tile_size and (self.workers > 1 or self.batch_size > 1):
+            upscale = self.tile_upscaler.enhance
+        else:
+            scaler = self.scaler
+            upscale = lambda frame: scaler.enhance(frame)[0]
+
+        if self.reuse_threshold is None:
+            return upscale
+
+        previous = {}
+
+        def upscale_with_reuse(frame):
+            thumbnail = cv2.resize(
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
+                (64, 36),
+                interpolation=cv2.INTER_AREA,
+            ).astype(np.float32)
+            if "thumbnail" in previous and (
+                np.abs(thumbnail - previous["thumbnail"]).mean() <= self.reuse_threshold
+            ):
+                return previous["output"]
+            previous["thumbnail"] = thumbnail
+            previous["output"] = upscale(frame)
+            return previous["output"]
+
+        return upscale_with_reuse
+
+    def get_params(self) -> dict:
+        params = {
+            "target_width": self.target_width,
+            "ai": self.ai,
+            "encoding": self.encoding_profile.get_params(),
+        }
+        if self.ai:
+            params.update(
+                model_name=self.model_name, reuse_threshold=self.reuse_threshold
             )
+        return params
 
-    @staticmethod
-    def __resize_video_with_moviepy(input_path, output_path, target_width):
+    def __resize_video_with_moviepy(self, input_path, output_path, target_width):
         clip = VideoFileClip(input_path)
         aspect_ratio = clip.h / clip.w
         new_height = int(target_width * aspect_ratio)
         resized_clip = clip.resized(width=target_width)
-        resized_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
+        resized_clip.write_videofile(
+            output_path, **self.encoding_profile.moviepy_params(output_path)
+        )
         return new_height
 
     def __process_frames_with_ai(self, file_path, temp_dir):
         frame_width, frame_height, fps = self.__extract_frames(file_path, temp_dir)
         frame_files = sorted(os.listdir(temp_dir))
+        upscale = self.__frame_upscaler()
         for i, frame_file in enumerate(frame_files, start=1):
             self.logger.info(f"Upscaling frame ({i}/{len(frame_files)})")
             frame_path = os.path.join(temp_dir, frame_file)
             frame = cv2.imread(frame_path, cv2.IMREAD_COLOR)
-            upscaled_frame, _ = self.scaler.enhance(frame)
+            upscaled_frame = upscale(frame)
             _, resized_frame = self.__resize_frame(
                 upscaled_frame, self.target_width, frame.shape[1], frame.shape[0]
             )
@@ -75,6 +230,9 @@ class VideoScaler(IVideoScaler):
             new_height = self.__resize_video_with_moviepy(
                 file_path, temp_output_path, self.target_width
             )
+        elif self.streaming:
+            self.logger.info("Using AI for upscaling (streaming).")
+            new_height = self.__stream_with_ai(file_path, temp_output_path)
         else:
             self.logger.info("Using AI for upscaling.")
             temp_dir = os.path.join(RESULTS_PATH, "temp_frames")
@@ -93,6 +251,125 @@ class VideoScaler(IVideoScaler):
         )
         os.replace(temp_output_path, file_path)
 
+    def plan_scale(self, render_plan: RenderPlan):
+        if not self.ai:
+            render_plan.add("scale", lambda clip: clip.resized(width=self.target_width))
+            return
+
+        def upscale_clip(clip):
+            upscale = self.__frame_upscaler()
+            return clip.image_transform(
+                lambda frame: self.__enhance_frame(frame, upscale)
+            )
+
+        render_plan.add("ai upscale", upscale_clip)
+
+    def __enhance_frame(self, frame, upscale):
+        bgr_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        upscaled_frame = upscale(bgr_frame)
+        _, resized_frame = self.__resize_frame(
+            upscaled_frame, self.target_width, frame.shape[1], frame.shape[0]
+        )
+        return cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+
+    def __stream_with_ai(self, file_path, output_path):
+        cap = cv2.VideoCapture(file_path)
+        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        new_height = int(frame_height * (self.target_width / frame_width))
+        new_height -= new_height % 2
+        frame_size = frame_width * frame_height * 3
+
+        decoder = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-i",
+                file_path,
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "bgr24",
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        encoder = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-y",
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "bgr24",
+                "-s",
+                f"{self.target_width}x{new_height}",
+                "-r",
+                str(fps),
+                "-i",
+                "-",
+                "-i",
+                file_path,
+                "-map",
+                "0:v",
+                "-map",
+                "1:a?",
+                *self.encoding_profile.video_args(),
+                "-c:a",
+                "copy",
+                "-shortest",
+                output_path,
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+        frames = queue.Queue(maxsize=self.queue_size)
+
+        def read_frames():
+            while True:
+                data = decoder.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                frame = np.frombuffer(data, np.uint8)
+                frames.put(frame.reshape(frame_height, frame_width, 3))
+            frames.put(None)
+
+        reader = threading.Thread(target=read_frames, daemon=True)
+        reader.start()
+
+        upscale = self.__frame_upscaler()
+        try:
+            i = 0
+            while (frame := frames.get()) is not None:
+                i += 1
+                self.logger.info(f"Upscaling frame ({i}/{frame_count})")
+                upscaled_frame = upscale(frame)
+                resized_frame = cv2.resize(
+                    upscaled_frame,
+                    (self.target_width, new_height),
+                    interpolation=cv2.INTER_LANCZOS4,
+                )
+                encoder.stdin.write(resized_frame.tobytes())
+        finally:
+            encoder.stdin.close()
+            decoder.kill()
+            while reader.is_alive():
+                try:
+                    frames.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            decoder.wait()
+            encoder.wait()
+
+        if encoder.returncode != 0:
+            raise RuntimeError(f"Encoding {output_path} failed")
+        return new_height
+
     @staticmethod
     def __extract_frames(file_path, temp_dir):
         cap = cv2.VideoCapture(file_path)
@@ -119,29 +396,7 @@ class VideoScaler(IVideoScaler):
             frame, (target_width, new_height), interpolation=cv2.INTER_LANCZOS4
         )
 
-    @staticmethod
-    def __assemble_video(temp_dir, output_video_path, fps, original_video_path):
-        temp_audio_path = os.path.join(temp_dir, "audio.aac")
-
-        # Extract audio from the original video
-        extract_audio_command = [
-            "ffmpeg",
-            "-y",
-            "-i",
-            original_video_path,
-            "-vn",  # No video
-            "-c:a",
-            "copy",  # Copy audio without re-encoding
-            temp_audio_path,
-        ]
-        subprocess.run(
-            extract_audio_command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-
-        # Assemble video with audio
+    def __assemble_video(self, temp_dir, output_video_path, fps, original_video_path):
         assemble_command = [
             "ffmpeg",
             "-y",
@@ -150,11 +405,12 @@ class VideoScaler(IVideoScaler):
             "-i",
             f"{temp_dir}/frame_%04d.png",
             "-i",
-            temp_audio_path,
-            "-c:v",
-            "libx264",
-            "-pix_fmt",
-            "yuv420p",
+            original_video_path,
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a:0?",
+            *self.encoding_profile.video_args(),
             "-c:a",
             "copy",
             "-shortest",
@@ -1,12 +1,25 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
 import torch
 import whisperx
 from clipsai import Transcriber, Transcription
+from clipsai.transcribe.exceptions import NoSpeechError
 from clipsai.transcribe.transcriber import TranscriberConfigManager
 from clipsai.utils.pytorch import get_compute_device, assert_valid_torch_device
 from clipsai.utils.type_checker import TypeChecker
 
 from abstractions.IVideoTranscriber import IVideoTranscriber
+from utils.AudioStore import AudioStore
 from utils.Logger import Logger
+from utils.ModelRegistry import ModelRegistry
+from utils.SilenceSplitter import SilenceSplitter
+
+chunk_worker = {}
 
 
 class CustomTranscriberConfigManager(TranscriberConfigManager):
@@ -17,6 +30,73 @@ class CustomTranscriberConfigManager(TranscriberConfigManager):
         return super().get_valid_model_sizes() + ["turbo"]
 
 
+def init_chunk_worker(
+    model_size: str,
+    device: str,
+    precision: str,
+    threads: int,
+    process_queue: multiprocessing.Queue,
+):
+    Logger.setup_worker(process_queue)
+    torch.set_num_threads(threads)
+    chunk_worker["device"] = device
+    chunk_worker["align_models"] = {}
+    chunk_worker["model"] = whisperx.load_model(
+        model_size, device=device, compute_type=precision, threads=threads
+    )
+
+
+def transcribe_chunk(
+    audio_path: str, start: int, end: int, language: str or None, batch_size: int
+) -> tuple[str, list[dict]]:
+    audio = np.asarray(np.memmap(audio_path, dtype="<f4", mode="r")[start:end])
+    device = chunk_worker["device"]
+    result = chunk_worker["model"].transcribe(
+        audio, language=language, batch_size=batch_size
+    )
+    if not result["segments"]:
+        return result["language"], []
+
+    if result["language"] not in chunk_worker["align_models"]:
+        chunk_worker["align_models"][result["language"]] = whisperx.load_align_model(
+            language_code=result["language"], device=device
+        )
+    align_model, metadata = chunk_worker["align_models"][result["language"]]
+    aligned = whisperx.align(
+        result["segments"],
+        align_model,
+        metadata,
+        audio,
+        device,
+        return_char_alignments=True,
+    )
+
+    return result["language"], to_char_info(aligned, start / AudioStore.SAMPLE_RATE)
+
+
+def detect_chunk_language(audio_path: str, start: int, end: int) -> str:
+    audio = np.asarray(np.memmap(audio_path, dtype="<f4", mode="r")[start:end])
+    return chunk_worker["model"].detect_language(audio)
+
+
+def to_char_info(aligned: dict, offset: float = 0) -> list[dict]:
+    char_info = [
+        {
+            "char": char["char"],
+            "start_time": float(char["start"]) + offset if "start" in char else None,
+            "end_time": float(char["end"]) + offset if "end" in char else None,
+            "speaker": None,
+        }
+        for segment in aligned["segments"]
+        for char in segment["chars"]
+    ]
+    while char_info and char_info[0]["char"] == " ":
+        char_info.pop(0)
+    while char_info and char_info[-1]["char"] == " ":
+        char_info.pop()
+    return char_info
+
+
 class VideoTranscriber(Transcriber, IVideoTranscriber):
     def __init__(
         self,
@@ -24,8 +104,22 @@ class VideoTranscriber(Transcriber, IVideoTranscriber):
         model_size: str = None,
         device: str = None,
         precision: str = None,
+        model_registry: ModelRegistry = None,
+        audio_store: AudioStore = None,
+        chunk_workers: int = 1,
+        chunk_duration: float = 300,
+        worker_threads: int = None,
     ) -> None:
         self._logger = logger
+        self._model_registry = model_registry or ModelRegistry.shared()
+        self._audio_store = audio_store
+        self._chunk_workers = chunk_workers
+        self._chunk_duration = chunk_duration
+        self._worker_threads = worker_threads or max(
+            1, (os.cpu_count() or 1) // max(1, chunk_workers)
+        )
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self._config_manager = CustomTranscriberConfigManager()
         self._type_checker = TypeChecker()
 
@@ -46,12 +140,33 @@ class VideoTranscriber(Transcriber, IVideoTranscriber):
         self._precision = precision
         self._device = device
         self._model_size = model_size
-        self._model = whisperx.load_model(
-            whisper_arch=self._model_size,
-            device=self._device,
-            compute_type=self._precision,
+
+    @property
+    def _model(self):
+        return self._model_registry.get(
+            "whisperx",
+            self._model_size,
+            self._device,
+            self._precision,
+            loader=lambda: whisperx.load_model(
+                whisper_arch=self._model_size,
+                device=self._device,
+                compute_type=self._precision,
+            ),
         )
 
+    def get_params(self) -> dict:
+        params = {"model_size": self._model_size, "precision": self._precision}
+        if self._chunk_workers > 1:
+            params.update(chunk_duration=self._chunk_duration)
+        return params
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
     def transcribe(
         self,
         audio_file_path: str,
@@ -60,9 +175,120 @@ class VideoTranscriber(Transcriber, IVideoTranscriber):
     ) -> Transcription:
         if not iso6391_lang_code:
             self._logger.info("Language not specified, using auto-detection:")
-        transcription = super().transcribe(
-            audio_file_path, iso6391_lang_code, batch_size
-        )
+        if self._chunk_workers > 1:
+            transcription = self.__transcribe_chunks(
+                audio_file_path, iso6391_lang_code, batch_size
+            )
+        elif self._audio_store:
+            transcription = self.__transcribe_stored(
+                audio_file_path, iso6391_lang_code, batch_size
+            )
+        else:
+            transcription = super().transcribe(
+                audio_file_path, iso6391_lang_code, batch_size
+            )
         self._logger.info(f"Language: {transcription.language}")
         self._logger.info(f"Founded {len(transcription.words)} sentences")
         return transcription
+
+    def __transcribe_stored(
+        self, file_path: str, language: str or None, batch_size: int
+    ) -> Transcription:
+        if language is not None:
+            self._config_manager.assert_valid_language(language)
+        audio = np.asarray(self._audio_store.load(file_path))
+        result = self._model.transcribe(audio, language=language, batch_size=batch_size)
+        align_model, metadata = self.__align_model(result["language"])
+        aligned = whisperx.align(
+            result["segments"],
+            align_model,
+            metadata,
+            audio,
+            self._device,
+            return_char_alignments=True,
+        )
+        return self.__build_transcription(
+            file_path, to_char_info(aligned), result["language"]
+        )
+
+    def __align_model(self, language: str):
+        return self._model_registry.get(
+            "whisperx-align",
+            language,
+            self._device,
+            loader=lambda: whisperx.load_align_model(
+                language_code=language, device=self._device
+            ),
+        )
+
+    def __transcribe_chunks(
+        self, file_path: str, language: str or None, batch_size: int
+    ) -> Transcription:
+        audio_store = self._audio_store or AudioStore.shared()
+        audio = audio_store.load(file_path)
+        duration = len(audio) / AudioStore.SAMPLE_RATE
+        chunk_count = max(
+            min(self._chunk_workers, int(duration // 60) or 1),
+            round(duration / self._chunk_duration),
+        )
+        chunks = SilenceSplitter(AudioStore.SAMPLE_RATE).split(audio, chunk_count)
+        self._logger.info(
+            f"Transcribing {len(chunks)} chunks on {self._chunk_workers} workers, "
+            f"{self._worker_threads} threads each"
+        )
+
+        pool = self.__pool()
+        audio_path = audio_store.artifact_path(file_path)
+        if language is None:
+            language = pool.submit(
+                detect_chunk_language, audio_path, *chunks[0]
+            ).result()
+            self._logger.info(f"Detected language: {language}")
+        futures = [
+            pool.submit(transcribe_chunk, audio_path, start, end, language, batch_size)
+            for start, end in chunks
+        ]
+        results = [future.result() for future in futures]
+
+        char_info = []
+        for _, chunk_chars in results:
+            if chunk_chars and char_info:
+                char_info.append(
+                    {"char": " ", "start_time": None, "end_time": None, "speaker": None}
+                )
+            char_info += chunk_chars
+
+        return self.__build_transcription(file_path, char_info, language)
+
+    def __pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._chunk_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_chunk_worker,
+                    initargs=(
+                        self._model_size,
+                        self._device,
+                        self._precision,
+                        self._worker_threads,
+                        self._logger.get_process_queue(),
+                    ),
+                )
+            return self._pool
+
+    @staticmethod
+    def __build_transcription(
+        file_path: str, char_info: list[dict], language: str
+    ) -> Transcription:
+        if not char_info:
+            raise NoSpeechError(f"Media file '{file_path}' contains no active speech.")
+        return Transcription(
+            {
+                "source_software": "whisperx-v3",
+                "time_created": datetime.now(),
+                "language": language,
+                "num_speakers": None,
+                "char_info": char_info,
+            }
+        )
@@ -1,13 +1,22 @@
+import bisect
 import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from clipsai import ClipFinder, Transcription, Clip, AudioVideoFile, MediaEditor
 
 from abstractions.IVideoTrimmer import IVideoTrimmer
+from utils.EncodingProfile import EncodingProfile
 from utils.Logger import Logger
+from utils.MediaProbe import MediaProbe
+from utils.SceneIndex import SceneIndex
+from utils.TopicIndex import TopicIndex
 from utils.utils import RESULTS_PATH, format_time
 
 
 class VideoTrimmer(IVideoTrimmer):
+    SNAP_MODES = (None, "keyframe", "scene")
+
     def __init__(
         self,
         media_editor: MediaEditor,
@@ -15,52 +24,173 @@ class VideoTrimmer(IVideoTrimmer):
         logger: Logger,
         min_duration,
         max_duration,
+        workers: int = 1,
+        snap: str = None,
+        snap_tolerance: float = 1.0,
+        media_probe: MediaProbe = None,
+        topic_index: TopicIndex = None,
+        scene_index: SceneIndex = None,
+        encoding_profile: EncodingProfile = None,
     ):
+        if snap not in self.SNAP_MODES:
+            raise ValueError(f"Unknown snap mode '{snap}', expected {self.SNAP_MODES}")
+
         self._clip_finder = clip_finder
         self._media_editor = media_editor
         self._logger = logger
         self._min_duration = min_duration
         self._max_duration = max_duration
+        self._workers = max(1, workers)
+        self._snap = snap
+        self._snap_tolerance = snap_tolerance
+        self._media_probe = media_probe or MediaProbe.shared()
+        self._topic_index = topic_index
+        self._scene_index = scene_index or SceneIndex.shared()
+        self._encoding_profile = encoding_profile or EncodingProfile.intermediate()
+
+    def get_params(self) -> dict:
+        params = {
+            "min_duration": self._min_duration,
+            "max_duration": self._max_duration,
+            "encoding": self._encoding_profile.get_params(),
+        }
+        if self._snap:
+            params.update(snap=self._snap, snap_tolerance=self._snap_tolerance)
+        if self._snap == "scene":
+            params.update(scenes=self._scene_index.get_params())
+        return params
 
     def trim_clips(self, transcription: Transcription, file_path: str) -> list[str]:
-        clips = self._clip_finder.find_clips(transcription=transcription)
+        clips = self.snap_clips(self.find_clips(transcription, file_path), file_path)
+        return self.trim(clips, file_path)
+
+    def find_clips(
+        self,
+        transcription: Transcription,
+        file_path: str = None,
+        min_duration: float = None,
+        max_duration: float = None,
+    ) -> list[Clip]:
+        min_duration = self._min_duration if min_duration is None else min_duration
+        max_duration = self._max_duration if max_duration is None else max_duration
+        if self._topic_index and file_path:
+            clips = self._topic_index.find_clips(
+                file_path, transcription, min_duration, max_duration
+            )
+        else:
+            clips = self._clip_finder.find_clips(transcription=transcription)
         clips = [
             clip
             for clip in clips
-            if self._min_duration
-            <= (clip.end_time - clip.start_time)
-            <= self._max_duration
+            if min_duration <= (clip.end_time - clip.start_time) <= max_duration
         ]
         self._logger.info(f"Found {len(clips)} clips")
-        return self.__trim(clips, file_path)
+        return clips
+
+    def snap_clips(self, clips: list[Clip], file_path: str) -> list[Clip]:
+        if not self._snap or not clips:
+            return clips
+
+        keyframes = self._media_probe.keyframes(file_path)
+        if self._snap == "scene":
+            start_points = end_points = self._scene_index.load(file_path).tolist()
+        else:
+            start_points, end_points = keyframes, []
+
+        snapped_clips = []
+        for clip in clips:
+            start_time = self.__snap_time(clip.start_time, start_points)
+            end_time = self.__snap_time(clip.end_time, end_points)
+            if end_time <= start_time:
+                start_time, end_time = clip.start_time, clip.end_time
+            snapped_clips.append(
+                Clip(start_time, end_time, clip.start_char, clip.end_char)
+            )
+
+        copied = sum(
+            self.__is_keyframe(clip.start_time, keyframes) for clip in snapped_clips
+        )
+        self._logger.info(
+            f"Snapped clips to {self._snap}s, {copied}/{len(clips)} can be stream-copied"
+        )
+        return snapped_clips
 
-    def __trim(self, clips: list[Clip], file_path: str):
+    def trim(self, clips: list[Clip], file_path: str) -> list[str]:
         original_video_name = os.path.splitext(os.path.basename(file_path))[0]
         clips_folder = os.path.join(RESULTS_PATH, original_video_name)
         os.makedirs(clips_folder, exist_ok=True)
 
         media_file = AudioVideoFile(file_path)
+        keyframes = self._media_probe.keyframes(file_path) if self._snap else []
 
-        clip_paths = []
-
-        for clip in clips:
+        def trim_clip(clip: Clip) -> str:
             clip_name = (
                 f"{format_time(clip.start_time, '_')}"
                 f"__{format_time(clip.end_time, '_')}.mp4"
             )
             clip_path = os.path.join(clips_folder, clip_name)
 
-            self._logger.info(
-                f"Trimming clip {format_time(clip.start_time)}-{format_time(clip.end_time)}..."
-            )
+            if self.__is_keyframe(clip.start_time, keyframes):
+                self._logger.info(
+                    f"Copying clip {format_time(clip.start_time)}-{format_time(clip.end_time)}..."
+                )
+                self.__stream_copy(file_path, clip, clip_path)
+            else:
+                self._logger.info(
+                    f"Re-encoding clip {format_time(clip.start_time)}-{format_time(clip.end_time)}..."
+                )
+                self._media_editor.trim(
+                    media_file=media_file,
+                    start_time=clip.start_time,
+                    end_time=clip.end_time,
+                    trimmed_media_file_path=clip_path,
+                    **self._encoding_profile.media_editor_params(),
+                )
+            return clip_path
 
-            self._media_editor.trim(
-                media_file=media_file,
-                start_time=clip.start_time,
-                end_time=clip.end_time,
-                trimmed_media_file_path=clip_path,
-            )
+        if self._workers == 1:
+            return [trim_clip(clip) for clip in clips]
+
+        with ThreadPoolExecutor(self._workers, thread_name_prefix="trim") as pool:
+            return list(pool.map(trim_clip, clips))
+
+    def __snap_time(self, time: float, points: list[float]) -> float:
+        index = bisect.bisect_left(points, time)
+        candidates = points[max(0, index - 1) : index + 1]
+        if not candidates:
+            return time
+        nearest = min(candidates, key=lambda point: abs(point - time))
+        return nearest if abs(nearest - time) <= self._snap_tolerance else time
 
-            clip_paths.append(clip_path)
+    @staticmethod
+    def __is_keyframe(time: float, keyframes: list[float]) -> bool:
+        index = bisect.bisect_left(keyframes, time - 0.001)
+        return index < len(keyframes) and keyframes[index] <= time + 0.001
 
-        return clip_paths
+    @staticmethod
+    def __stream_copy(file_path: str, clip: Clip, clip_path: str):
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-ss",
+                f"{clip.start_time:.6f}",
+                "-i",
+                file_path,
+                "-t",
+                f"{clip.end_time - clip.start_time:.6f}",
+                "-map",
+                "0:v:0",
+                "-map",
+                "0:a:0?",
+                "-c",
+                "copy",
+                "-avoid_negative_ts",
+                "make_zero",
+                clip_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.SilenceSplitter import SilenceSplitter
+
+SAMPLE_RATE = 100
+
+
+def speech(sample_count: int, silences: list[tuple[int, int]] = ()) -> np.ndarray:
+    audio = np.random.default_rng(0).uniform(0.5, 1.0, sample_count)
+    for start, end in silences:
+        audio[start:end] = 0
+    return audio.astype(np.float32)
+
+
+def splitter(search_window: float) -> SilenceSplitter:
+    return SilenceSplitter(
+        sample_rate=SAMPLE_RATE,
+        frame_duration=0.01,
+        smoothing=0.01,
+        search_window=search_window,
+    )
+
+
+def assert_contiguous(chunks: list[tuple[int, int]], sample_count: int):
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == sample_count
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+
+
+def test_split_balances_chunks_on_silence():
+    audio = speech(3000, [(950, 970), (2040, 2060)])
+
+    chunks = splitter(search_window=1.0).split(audio, 3)
+
+    assert_contiguous(chunks, len(audio))
+    assert len(chunks) == 3
+    assert 950 <= chunks[0][1] < 970
+    assert 2040 <= chunks[1][1] < 2060
+    assert all(abs((end - start) - 1000) <= 100 for start, end in chunks)
+
+
+def test_split_stays_inside_search_window():
+    audio = speech(2000, [(200, 220)])
+
+    chunks = splitter(search_window=0.5).split(audio, 2)
+
+    assert_contiguous(chunks, len(audio))
+    assert len(chunks) == 2
+    assert 950 <= chunks[0][1] < 1050
+
+
+def test_split_keeps_short_audio_whole():
+    audio = speech(5)
+
+    assert splitter(search_window=1.0).split(audio, 3) == [(0, 5)]
+    assert splitter(search_window=1.0).split(speech(3000), 1) == [(0, 3000)]
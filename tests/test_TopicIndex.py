@@ -0,0 +1,96 @@
+import types
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("clipsai")
+
+import clipsai.clip.clipfinder
+from clipsai import ClipFinder, Transcription
+
+from utils.TopicIndex import TopicIndex
+
+SENTENCE_COUNT = 240
+SENTENCE_DURATION = 4.0
+
+
+class FixedEmbedder:
+    def __init__(self):
+        generator = torch.Generator().manual_seed(0)
+        topics = torch.randn(12, 32, generator=generator)
+        noise = torch.randn(SENTENCE_COUNT, 32, generator=generator)
+        self.embeddings = topics.repeat_interleave(20, dim=0) + noise * 0.8
+
+    def embed_sentences(self, sentences: list[str]) -> torch.Tensor:
+        assert len(sentences) == SENTENCE_COUNT
+        return self.embeddings.clone()
+
+
+class FixedRegistry:
+    def __init__(self, embedder: FixedEmbedder):
+        self._embedder = embedder
+
+    def get(self, *key, loader):
+        return self._embedder
+
+
+@pytest.fixture
+def transcription() -> Transcription:
+    char_info = []
+    for index in range(SENTENCE_COUNT):
+        text = f"Sentence number {index}."
+        start_time = index * SENTENCE_DURATION
+        step = (SENTENCE_DURATION - 0.5) / len(text)
+        if char_info:
+            char_info.append(
+                {"char": " ", "start_time": None, "end_time": None, "speaker": None}
+            )
+        char_info += [
+            {
+                "char": char,
+                "start_time": start_time + i * step,
+                "end_time": start_time + (i + 1) * step,
+                "speaker": None,
+            }
+            for i, char in enumerate(text)
+        ]
+    return Transcription(
+        {
+            "source_software": "whisperx-v3",
+            "time_created": "2025-01-21 22:30:00.000000",
+            "language": "en",
+            "num_speakers": None,
+            "char_info": char_info,
+        }
+    )
+
+
+@pytest.mark.parametrize("min_duration, max_duration", [(15, 900), (40, 120)])
+def test_find_clips_matches_clip_finder(
+    tmp_path, monkeypatch, transcription, min_duration, max_duration
+):
+    embedder = FixedEmbedder()
+    monkeypatch.setattr(clipsai.clip.clipfinder, "TextEmbedder", lambda: embedder)
+    clip_finder = ClipFinder(device="cpu")
+    topic_index = TopicIndex(
+        clip_finder=clip_finder,
+        logger=types.SimpleNamespace(info=lambda message: None),
+        model_registry=FixedRegistry(embedder),
+        results_path=str(tmp_path),
+    )
+
+    expected = [
+        clip
+        for clip in clip_finder.find_clips(transcription)
+        if min_duration <= clip.end_time - clip.start_time <= max_duration
+    ]
+    clips = topic_index.find_clips(
+        "episode.mp4", transcription, min_duration, max_duration
+    )
+    cached = topic_index.find_clips(
+        "episode.mp4", transcription, min_duration, max_duration
+    )
+
+    assert expected
+    assert [clip.to_dict() for clip in clips] == [clip.to_dict() for clip in expected]
+    assert [clip.to_dict() for clip in cached] == [clip.to_dict() for clip in expected]
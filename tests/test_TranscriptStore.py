@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip("clipsai")
+
+from clipsai import Transcription
+
+from utils.TranscriptStore import TranscriptStore
+
+PARAMS = {"model_size": "tiny", "precision": "int8", "language": "ru"}
+
+
+def char(value: str, start_time: float or None, end_time: float or None) -> dict:
+    return {
+        "char": value,
+        "start_time": start_time,
+        "end_time": end_time,
+        "speaker": None,
+    }
+
+
+@pytest.fixture
+def transcription() -> Transcription:
+    return Transcription(
+        {
+            "source_software": "whisperx-v3",
+            "time_created": "2025-01-21 22:30:00.123456",
+            "language": "ru",
+            "num_speakers": None,
+            "char_info": [
+                char("H", 0.0, 0.1),
+                char("i", 0.1, 0.2),
+                char(".", None, None),
+                char(" ", None, None),
+                char("O", 1.0, 1.1),
+                char("k", 1.1, 1.2),
+                char(".", 1.2, 1.3),
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def episode(tmp_path) -> str:
+    episode_path = tmp_path / "episode.mp4"
+    episode_path.write_bytes(b"episode")
+    return str(episode_path)
+
+
+def test_save_load_round_trip(tmp_path, episode, transcription):
+    store = TranscriptStore(results_path=str(tmp_path / "results"))
+
+    store.save(episode, transcription, PARAMS)
+    loaded = store.load(episode, PARAMS)
+
+    assert loaded.created_time == transcription.created_time
+    assert loaded.source_software == transcription.source_software
+    assert loaded.language == transcription.language
+    assert loaded.get_char_info() == transcription.get_char_info()
+    assert loaded.get_word_info() == transcription.get_word_info()
+
+
+def test_load_rejects_changed_params(tmp_path, episode, transcription):
+    store = TranscriptStore(results_path=str(tmp_path / "results"))
+
+    store.save(episode, transcription, PARAMS)
+
+    assert store.load(episode, {**PARAMS, "model_size": "turbo"}) is None
+
+
+def test_words_reject_changed_source(tmp_path, episode, transcription):
+    store = TranscriptStore(results_path=str(tmp_path / "results"))
+    store.save(episode, transcription, PARAMS)
+
+    assert [word["word"] for word in store.words(episode, 0.5)] == ["Ok."]
+
+    with open(episode, "ab") as file:
+        file.write(b" re-encoded")
+
+    assert store.words(episode) is None
+    assert store.load(episode, PARAMS) is None
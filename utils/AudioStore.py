@@ -0,0 +1,100 @@
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from utils.utils import RESULTS_PATH
+
+
+class AudioStore:
+    SAMPLE_RATE = 16000
+    FILE_NAME = "audio.f32"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, results_path: str = RESULTS_PATH):
+        self._results_path = results_path
+        self._arrays = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "AudioStore":
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def artifact_path(self, file_path: str) -> str:
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self._results_path, video_name, self.FILE_NAME)
+
+    def load(self, file_path: str) -> np.ndarray:
+        artifact_path = self.artifact_path(file_path)
+        with self.__lock_for(artifact_path):
+            if not os.path.exists(artifact_path) or os.path.getmtime(
+                artifact_path
+            ) < os.path.getmtime(file_path):
+                self.__decode(file_path, artifact_path)
+            return self.open(os.path.dirname(artifact_path))
+
+    def open(self, folder: str) -> np.ndarray or None:
+        artifact_path = os.path.join(folder, self.FILE_NAME)
+        if not os.path.exists(artifact_path):
+            return None
+
+        key = (artifact_path, os.stat(artifact_path).st_mtime_ns)
+        with self._lock:
+            if key not in self._arrays:
+                self._arrays = {
+                    cached_key: array
+                    for cached_key, array in self._arrays.items()
+                    if cached_key[0] != artifact_path
+                }
+                self._arrays[key] = np.memmap(artifact_path, dtype="<f4", mode="r")
+            return self._arrays[key]
+
+    def window(
+        self, file_path: str, start_time: float = 0, end_time: float = None
+    ) -> np.ndarray:
+        return self.slice(self.load(file_path), start_time, end_time)
+
+    @classmethod
+    def slice(
+        cls, audio: np.ndarray, start_time: float = 0, end_time: float = None
+    ) -> np.ndarray:
+        start = max(0, int(round(start_time * cls.SAMPLE_RATE)))
+        end = len(audio) if end_time is None else int(round(end_time * cls.SAMPLE_RATE))
+        return audio[start : min(end, len(audio))]
+
+    def __lock_for(self, artifact_path: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(artifact_path, threading.Lock())
+
+    def __decode(self, file_path: str, artifact_path: str):
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        temp_artifact_path = f"{artifact_path}.temp"
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-i",
+                file_path,
+                "-vn",
+                "-ac",
+                "1",
+                "-ar",
+                str(self.SAMPLE_RATE),
+                "-f",
+                "f32le",
+                temp_artifact_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        os.replace(temp_artifact_path, artifact_path)
@@ -0,0 +1,102 @@
+import os
+
+MOVIEPY_AUDIO_EXTENSIONS = {"aac": "m4a", "alac": "m4a", "libmp3lame": "mp3"}
+
+
+class EncodingProfile:
+    def __init__(
+        self,
+        video_codec: str = "libx264",
+        preset: str = "medium",
+        crf: int = 23,
+        threads: int = 0,
+        pixel_format: str = "yuv420p",
+        audio_codec: str = "aac",
+        audio_bitrate: str = None,
+    ):
+        self.video_codec = video_codec
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+        self.pixel_format = pixel_format
+        self.audio_codec = audio_codec
+        self.audio_bitrate = audio_bitrate
+
+    @classmethod
+    def intermediate(cls, threads: int = 0) -> "EncodingProfile":
+        return cls(
+            preset="ultrafast",
+            crf=0,
+            threads=threads,
+            pixel_format="yuv444p",
+            audio_codec="alac",
+        )
+
+    @classmethod
+    def final(
+        cls,
+        preset: str = "medium",
+        crf: int = 23,
+        threads: int = 0,
+        pixel_format: str = "yuv420p",
+        audio_bitrate: str = "192k",
+    ) -> "EncodingProfile":
+        return cls(
+            preset=preset,
+            crf=crf,
+            threads=threads,
+            pixel_format=pixel_format,
+            audio_bitrate=audio_bitrate,
+        )
+
+    def get_params(self) -> dict:
+        return {
+            "video_codec": self.video_codec,
+            "preset": self.preset,
+            "crf": self.crf,
+            "pixel_format": self.pixel_format,
+            "audio_codec": self.audio_codec,
+            "audio_bitrate": self.audio_bitrate,
+        }
+
+    def video_args(self) -> list[str]:
+        return [
+            "-c:v",
+            self.video_codec,
+            "-preset",
+            self.preset,
+            "-crf",
+            str(self.crf),
+            "-pix_fmt",
+            self.pixel_format,
+            "-threads",
+            str(self.threads),
+        ]
+
+    def audio_args(self) -> list[str]:
+        args = ["-c:a", self.audio_codec]
+        if self.audio_bitrate:
+            args += ["-b:a", self.audio_bitrate]
+        return args
+
+    def moviepy_params(self, file_path: str, ffmpeg_params: list[str] = None) -> dict:
+        extension = MOVIEPY_AUDIO_EXTENSIONS.get(self.audio_codec, "m4a")
+        return {
+            "codec": self.video_codec,
+            "preset": self.preset,
+            "threads": self.threads or None,
+            "pixel_format": self.pixel_format,
+            "audio_codec": self.audio_codec,
+            "audio_bitrate": self.audio_bitrate,
+            "temp_audiofile": f"{os.path.splitext(file_path)[0]}_audio.{extension}",
+            "ffmpeg_params": ["-crf", str(self.crf), *(ffmpeg_params or [])],
+        }
+
+    def media_editor_params(self) -> dict:
+        return {
+            "video_codec": self.video_codec,
+            "audio_codec": self.audio_codec,
+            "crf": str(self.crf),
+            "preset": self.preset,
+            "num_threads": str(self.threads),
+        }
@@ -0,0 +1,209 @@
+import cv2
+import numpy as np
+from clipsai import Crops, Segment
+
+
+class FaceTracker:
+    def __init__(
+        self,
+        face_detector,
+        sample_fps: float = 3,
+        detect_width: int = 480,
+        static_threshold: float = 2.0,
+        smoothing: float = 0.6,
+        segment_fps: float = 6,
+        batch_size: int = 16,
+        dead_band: float = 0.05,
+        min_segment_duration: float = 1.0,
+    ):
+        self._face_detector = face_detector
+        self._sample_fps = sample_fps
+        self._detect_width = detect_width
+        self._static_threshold = static_threshold
+        self._smoothing = smoothing
+        self._segment_fps = segment_fps
+        self._batch_size = batch_size
+        self._dead_band = dead_band
+        self._min_segment_duration = min_segment_duration
+        self.detected_frames = 0
+        self.skipped_frames = 0
+
+    def track(
+        self, file_path: str, aspect_ratio: tuple[int, int], cuts: np.ndarray = None
+    ) -> Crops:
+        cap = cv2.VideoCapture(file_path)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        crop_width, crop_height = self.__crop_size(width, height, aspect_ratio)
+
+        downsample_factor = max(width / self._detect_width, 1)
+        detect_size = (int(width / downsample_factor), int(height / downsample_factor))
+        step = max(1, round(fps / self._sample_fps))
+        cuts = np.empty(0) if cuts is None else np.asarray(cuts, dtype=np.float64)
+
+        times, slots, detections, batch = [], [], [], []
+        reference_thumbnail = None
+        for index in range(frame_count):
+            if not cap.grab():
+                break
+            if index % step:
+                continue
+            _, frame = cap.retrieve()
+            small_frame = cv2.resize(frame, detect_size, interpolation=cv2.INTER_AREA)
+
+            thumbnail = cv2.resize(
+                cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY), (32, 18)
+            ).astype(np.float32)
+            times.append(index / fps)
+            if (
+                reference_thumbnail is not None
+                and self.__shot(times[-2], cuts) == self.__shot(times[-1], cuts)
+                and np.abs(thumbnail - reference_thumbnail).mean()
+                < self._static_threshold
+            ):
+                slots.append(None)
+                continue
+
+            reference_thumbnail = thumbnail
+            slots.append(len(detections) + len(batch))
+            batch.append(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB))
+            if len(batch) == self._batch_size:
+                detections += self.__detect(batch, downsample_factor)
+                batch = []
+        cap.release()
+        if batch:
+            detections += self.__detect(batch, downsample_factor)
+
+        self.detected_frames = len(detections)
+        self.skipped_frames = len(slots) - len(detections)
+
+        centers = self.__resolve_centers(slots, detections, (width / 2, height / 2))
+        centers = np.array(centers, dtype=np.float32).reshape(-1, 2)
+        shots = np.searchsorted(cuts, times, side="right")
+        for shot in np.unique(shots):
+            centers[shots == shot] = self.__smooth(centers[shots == shot])
+
+        duration = frame_count / fps
+        boundaries = [0, *cuts[(cuts > 0) & (cuts < duration)].tolist(), duration]
+        segments = []
+        for shot_start, shot_end in zip(boundaries, boundaries[1:]):
+            in_shot = shots == self.__shot(shot_start, cuts)
+            self.__build_segments(
+                segments,
+                np.asarray(times)[in_shot] if in_shot.any() else times,
+                centers[in_shot] if in_shot.any() else centers,
+                shot_start,
+                shot_end,
+                width,
+                height,
+                crop_width,
+                crop_height,
+            )
+        return Crops(width, height, crop_width, crop_height, segments)
+
+    def __detect(self, frames: list[np.ndarray], downsample_factor: float) -> list:
+        boxes, _ = self._face_detector.detect(frames)
+        centers = []
+        for frame_boxes in boxes:
+            if frame_boxes is None or len(frame_boxes) == 0:
+                centers.append(None)
+                continue
+            areas = (frame_boxes[:, 2] - frame_boxes[:, 0]) * (
+                frame_boxes[:, 3] - frame_boxes[:, 1]
+            )
+            x1, y1, x2, y2 = frame_boxes[int(np.argmax(areas))]
+            centers.append(
+                ((x1 + x2) / 2 * downsample_factor, (y1 + y2) / 2 * downsample_factor)
+            )
+        return centers
+
+    @staticmethod
+    def __resolve_centers(slots: list, detections: list, default: tuple) -> list:
+        centers = []
+        previous = None
+        for slot in slots:
+            center = detections[slot] if slot is not None else previous
+            if center is None:
+                center = previous
+            centers.append(center)
+            previous = center
+
+        first = next((center for center in centers if center is not None), default)
+        return [center if center is not None else first for center in centers]
+
+    def __smooth(self, centers: np.ndarray) -> np.ndarray:
+        if len(centers) < 2 or not self._smoothing:
+            return centers
+        alpha = 1 - self._smoothing
+        for i in range(1, len(centers)):
+            centers[i] = alpha * centers[i] + self._smoothing * centers[i - 1]
+        for i in range(len(centers) - 2, -1, -1):
+            centers[i] = alpha * centers[i] + self._smoothing * centers[i + 1]
+        return centers
+
+    def __build_segments(
+        self,
+        segments: list[Segment],
+        times,
+        centers: np.ndarray,
+        start_time: float,
+        end_time: float,
+        width: int,
+        height: int,
+        crop_width: int,
+        crop_height: int,
+    ):
+        segment_times = np.arange(start_time, end_time, 1 / self._segment_fps)
+        if len(times):
+            xs = np.interp(segment_times, times, centers[:, 0])
+            ys = np.interp(segment_times, times, centers[:, 1])
+        else:
+            xs = np.full(len(segment_times), width / 2)
+            ys = np.full(len(segment_times), height / 2)
+
+        max_dx = self._dead_band * crop_width
+        max_dy = self._dead_band * crop_height
+        shot_segments = []
+        for start, center_x, center_y in zip(segment_times, xs, ys):
+            x = self.__clamp_even(center_x - crop_width / 2, width - crop_width)
+            y = self.__clamp_even(center_y - crop_height / 2, height - crop_height)
+            if shot_segments:
+                last = shot_segments[-1]
+                if (
+                    (abs(x - last.x) <= max_dx and abs(y - last.y) <= max_dy)
+                    or start - last.start_time < self._min_segment_duration
+                    or end_time - start < self._min_segment_duration
+                ):
+                    continue
+                shot_segments[-1] = Segment(
+                    [], last.start_time, float(start), last.x, last.y
+                )
+            shot_segments.append(Segment([], float(start), float(end_time), x, y))
+
+        first = shot_segments[0] if shot_segments else None
+        if (
+            first
+            and segments
+            and (segments[-1].x, segments[-1].y) == (first.x, first.y)
+        ):
+            start = segments[-1].start_time
+            segments[-1] = Segment([], start, first.end_time, first.x, first.y)
+            shot_segments.pop(0)
+        segments += shot_segments
+
+    @staticmethod
+    def __shot(time: float, cuts: np.ndarray) -> int:
+        return int(np.searchsorted(cuts, time, side="right"))
+
+    @staticmethod
+    def __clamp_even(value: float, upper: int) -> int:
+        return int(np.clip(value, 0, upper)) // 2 * 2
+
+    @staticmethod
+    def __crop_size(width: int, height: int, aspect_ratio: tuple[int, int]):
+        ratio_width, ratio_height = aspect_ratio
+        if width / height > ratio_width / ratio_height:
+            return int(height * ratio_width / ratio_height), height
+        return width, int(width * ratio_height / ratio_width)
@@ -1,6 +1,13 @@
+import json
 import logging
+import multiprocessing
+import queue
+import re
 import sys
+import threading
 import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
 
 from rich.console import Console
 from rich.live import Live
@@ -8,12 +15,25 @@ from rich.logging import RichHandler
 from rich.panel import Panel
 from rich.text import Text
 
+from utils.Metrics import MetricsRecorder
+
+
+PROGRESS_PATTERN = re.compile(r"\d+%\||\bt:\s*\d+%")
+
 
 class LoggerOutput:
-    def __init__(self, logger_method):
+    def __init__(self, logger_method, progress_interval: float = 0):
         self.logger_method = logger_method
+        self.progress_interval = progress_interval
+        self.last_progress_time = 0
 
     def write(self, message):
+        if "\r" in message or PROGRESS_PATTERN.search(message):
+            now = time.monotonic()
+            if now - self.last_progress_time < self.progress_interval:
+                return
+            self.last_progress_time = now
+            message = message.rsplit("\r", 1)[-1] or message.strip("\r")
         text = message.strip()
         if text:
             self.logger_method(text)
@@ -22,8 +42,35 @@ class LoggerOutput:
         pass
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(
+            {
+                "time": record.created,
+                "level": record.levelname,
+                "process": record.process,
+                "thread": record.threadName,
+                "message": record.getMessage(),
+            },
+            ensure_ascii=False,
+        )
+
+
 class Logger:
-    def __init__(self):
+    MODES = ("rich", "plain", "json")
+
+    def __init__(
+        self,
+        metrics_path: str = None,
+        mode: str = "rich",
+        progress_interval: float = 1.0,
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown log mode '{mode}', expected {self.MODES}")
+
+        self.mode = mode
+        self.progress_interval = progress_interval
+        self.lock = threading.RLock()
         self.current_title = None
         self.current_subtitle = None
         self.current_stage = None
@@ -31,82 +78,198 @@ class Logger:
         self.stage_start_time = None
         self.subtitle_start_time = None
 
+        self.metrics = MetricsRecorder(metrics_path) if metrics_path else None
+        self.spans = {}
+        self.running_stages = []
+        self.local = threading.local()
+
         self.original_stdout = sys.stdout
         self.original_stderr = sys.stderr
 
-        self.console = Console(file=sys.stdout)
+        self.console = None
+        self.live = None
+        self.process_queue = None
+        self.process_listener = None
+
+        self.handler = self._setup_handler()
+        self.queue = queue.SimpleQueue()
+        self.listener = QueueListener(
+            self.queue, self.handler, respect_handler_level=True
+        )
+        self.listener.start()
 
         self.logger = self._setup_logger()
 
-        self.live = Live(console=self.console, refresh_per_second=10, auto_refresh=True)
-        self.live.start()
+        if self.mode == "rich":
+            self.live = Live(
+                console=self.console,
+                refresh_per_second=4,
+                auto_refresh=True,
+                get_renderable=self._render_panel,
+            )
+            self.live.start()
 
-        sys.stdout = LoggerOutput(self.debug)
-        sys.stderr = LoggerOutput(self.debug)
+        sys.stdout = LoggerOutput(self.debug, progress_interval)
+        sys.stderr = LoggerOutput(self.debug, progress_interval)
 
     def set_level(self, level):
         self.logger.setLevel(level)
 
+    def _setup_handler(self):
+        if self.mode == "rich":
+            self.console = Console(file=self.original_stdout)
+            handler = RichHandler(console=self.console, show_time=True, show_path=False)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            return handler
+
+        handler = logging.StreamHandler(self.original_stdout)
+        if self.mode == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(
+                logging.Formatter(
+                    "%(asctime)s %(levelname)-7s [%(processName)s/%(threadName)s] "
+                    "%(message)s"
+                )
+            )
+        return handler
+
     def _setup_logger(self):
         logger = logging.getLogger("rich_logger")
         logger.setLevel(logging.DEBUG)
         logger.propagate = False
 
-        handler = RichHandler(console=self.console, show_time=True, show_path=False)
-        handler.setFormatter(logging.Formatter("%(message)s"))
-        logger.addHandler(handler)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(self.queue))
 
         return logger
 
+    def get_process_queue(self) -> multiprocessing.Queue:
+        with self.lock:
+            if self.process_queue is None:
+                self.process_queue = multiprocessing.get_context("spawn").Queue()
+                self.process_listener = QueueListener(
+                    self.process_queue, self.handler, respect_handler_level=True
+                )
+                self.process_listener.start()
+            return self.process_queue
+
+    @staticmethod
+    def setup_worker(
+        process_queue: multiprocessing.Queue,
+        level=logging.DEBUG,
+        progress_interval: float = 1.0,
+    ):
+        logger = logging.getLogger("rich_logger")
+        logger.setLevel(level)
+        logger.propagate = False
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(process_queue))
+
+        sys.stdout = LoggerOutput(logger.debug, progress_interval)
+        sys.stderr = LoggerOutput(logger.debug, progress_interval)
+        return logger
+
     def log_progress(self, title: str = None, subtitle: str = None, stage: str = None):
-        self._update_stage(stage)
-        self._update_subtitle(subtitle)
-        self._update_title(title)
-        if title:
-            self.info(f"{title}...")
-        if subtitle:
-            self.info(f"{subtitle}...")
-        if stage:
-            self.info(f"{stage}...")
-
-        self._update_panel()
+        with self.lock:
+            self._update_stage(stage)
+            self._update_subtitle(subtitle)
+            self._update_title(title)
+            if title:
+                self.info(f"{title}...")
+            if subtitle:
+                self.info(f"{subtitle}...")
+            if stage:
+                self.info(f"{stage}...")
+
+    @contextmanager
+    def stage(self, stage: str):
+        with self.lock:
+            self._log_elapsed_time(self.current_stage, self.stage_start_time, "stage")
+            self.current_stage = None
+            self.running_stages.append(stage)
+        self.info(f"{stage}...")
+
+        start_time = time.time()
+        span = (
+            self.metrics.start("stage", stage, self.current_subtitle)
+            if self.metrics
+            else None
+        )
+        self.local.span = span
+        try:
+            yield
+        finally:
+            self.local.span = None
+            with self.lock:
+                self.running_stages.remove(stage)
+            self.info(f"'{stage}' completed in {time.time() - start_time:.2f} seconds.")
+            if span:
+                self._log_span(self.metrics.finish(span))
+
+    def count_frames(self, frames: int):
+        if self.metrics:
+            self.metrics.count_frames(frames, getattr(self.local, "span", None))
 
     def _update_stage(self, stage):
         if stage and stage != self.current_stage:
-            self._log_elapsed_time(self.current_stage, self.stage_start_time)
+            self._log_elapsed_time(self.current_stage, self.stage_start_time, "stage")
             self.current_stage = stage
             self.stage_start_time = time.time()
+            self._start_span("stage", stage, self.current_subtitle)
 
     def _update_subtitle(self, subtitle):
         if subtitle and subtitle != self.current_subtitle:
-            self._log_elapsed_time(self.current_subtitle, self.subtitle_start_time)
+            self._log_elapsed_time(
+                self.current_subtitle, self.subtitle_start_time, "subtitle"
+            )
             self.current_subtitle = subtitle
             self.subtitle_start_time = time.time()
+            self._start_span("subtitle", subtitle, self.current_title)
 
     def _update_title(self, title):
         if title and title != self.current_title:
-            self._log_elapsed_time(self.current_title, self.title_start_time)
+            self._log_elapsed_time(self.current_title, self.title_start_time, "title")
             self.current_title = title
             self.title_start_time = time.time()
+            self._start_span("title", title)
 
-    def _log_elapsed_time(self, task, start_time):
+    def _start_span(self, kind, name, parent=None):
+        if self.metrics:
+            self.spans[kind] = self.metrics.start(kind, name, parent)
+
+    def _log_elapsed_time(self, task, start_time, kind=None):
         if task and start_time:
             elapsed_time = time.time() - start_time
             self.info(f"'{task}' completed in {elapsed_time:.2f} seconds.")
+        span = self.spans.pop(kind, None)
+        if span:
+            self._log_span(self.metrics.finish(span))
+
+    def _log_span(self, record: dict):
+        cpu_time = "n/a" if record["cpu_time"] is None else f"{record['cpu_time']:.2f}s"
+        if not record["exclusive"]:
+            cpu_time += " (thread only)"
+        self.debug(
+            f"'{record['name']}': cpu {cpu_time}, "
+            f"peak {record['peak_rss_mb']:.0f} MB, {record['fps']:.1f} fps"
+        )
 
-    def _update_panel(self):
-        stage = f"{self.current_stage}..." if self.current_stage else ""
+    def _render_panel(self):
+        stages = list(self.running_stages) or [self.current_stage]
+        stage = ", ".join(f"{name}..." for name in stages if name)
         title = f"[bold magenta]{self.current_title}" if self.current_title else None
         subtitle = (
             f"[bold magenta]{self.current_subtitle}" if self.current_subtitle else None
         )
-        stage_panel = Panel(
+        return Panel(
             Text(stage, justify="center", style="bold white on blue"),
             title=f"{title}",
             subtitle=subtitle,
             title_align="left",
         )
-        self.live.update(stage_panel, refresh=True)
 
     def info(self, message: str):
         self.logger.info(message)
@@ -121,10 +284,19 @@ class Logger:
         self.logger.warning(message)
 
     def stop(self):
-        self._log_elapsed_time(self.current_stage, self.stage_start_time)
-        self._log_elapsed_time(self.current_subtitle, self.subtitle_start_time)
-        self._log_elapsed_time(self.current_title, self.title_start_time)
-        self.live.stop()
+        with self.lock:
+            self._log_elapsed_time(self.current_stage, self.stage_start_time, "stage")
+            self._log_elapsed_time(
+                self.current_subtitle, self.subtitle_start_time, "subtitle"
+            )
+            self._log_elapsed_time(self.current_title, self.title_start_time, "title")
+        if self.metrics:
+            self.metrics.stop()
+        if self.process_listener:
+            self.process_listener.stop()
+        self.listener.stop()
+        if self.live:
+            self.live.stop()
 
         # Restore original stdout and stderr
         sys.stdout = self.original_stdout
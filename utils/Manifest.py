@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from clipsai import Clip
+
+
+def file_checksum(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    FILE_NAME = "manifest.json"
+
+    def __init__(self, folder: str):
+        self._path = os.path.join(folder, self.FILE_NAME)
+        self._lock = threading.RLock()
+        self._data = {"source": None, "clips": {}}
+        if os.path.exists(self._path):
+            with open(self._path, "r", encoding="utf-8") as file:
+                self._data = json.load(file)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def source(self) -> str or None:
+        return self._data["source"]
+
+    def reset(self, source: str):
+        with self._lock:
+            self._data = {"source": source, "clips": {}}
+            self.__save()
+
+    def set_clips(self, source: str, clips: list[tuple[Clip, str]]):
+        with self._lock:
+            self._data["source"] = source
+            self._data["clips"] = {
+                os.path.basename(clip_path): {
+                    "path": clip_path,
+                    "start_time": clip.start_time,
+                    "end_time": clip.end_time,
+                    "start_char": clip.start_char,
+                    "end_char": clip.end_char,
+                    "status": "pending",
+                    "stages": [self.__stage("trim", clip_path)],
+                    "error": None,
+                }
+                for clip, clip_path in clips
+            }
+            self.__save()
+
+    def clips(self) -> list[tuple[Clip, str]]:
+        with self._lock:
+            return [
+                (
+                    Clip(
+                        entry["start_time"],
+                        entry["end_time"],
+                        entry["start_char"],
+                        entry["end_char"],
+                    ),
+                    entry["path"],
+                )
+                for entry in self._data["clips"].values()
+            ]
+
+    def has_clip(self, clip_path: str) -> bool:
+        return self.__entry(clip_path) is not None
+
+    def status(self, clip_path: str) -> str or None:
+        entry = self.__entry(clip_path)
+        return entry["status"] if entry else None
+
+    def completed_stages(self, clip_path: str) -> list[str]:
+        entry = self.__entry(clip_path)
+        return [stage["name"] for stage in entry["stages"]] if entry else []
+
+    def verify(self, clip_path: str) -> bool:
+        entry = self.__entry(clip_path)
+        if not entry or not entry["stages"] or not os.path.exists(clip_path):
+            return False
+        return entry["stages"][-1]["checksum"] == file_checksum(clip_path)
+
+    def start_clip(self, clip_path: str):
+        self.__update(clip_path, status="running", error=None)
+
+    def restart_clip(self, clip_path: str):
+        self.__update(
+            clip_path,
+            status="running",
+            error=None,
+            stages=[self.__stage("trim", clip_path)],
+        )
+
+    def complete_stage(self, clip_path: str, stage: str):
+        with self._lock:
+            self.__entry(clip_path)["stages"].append(self.__stage(stage, clip_path))
+            self.__save()
+
+    def finish_clip(self, clip_path: str):
+        self.__update(clip_path, status="done")
+
+    def fail_clip(self, clip_path: str, error: str):
+        self.__update(clip_path, status="failed", error=error)
+
+    def __entry(self, clip_path: str) -> dict or None:
+        with self._lock:
+            return self._data["clips"].get(os.path.basename(clip_path))
+
+    def __update(self, clip_path: str, **values):
+        with self._lock:
+            self.__entry(clip_path).update(values)
+            self.__save()
+
+    @staticmethod
+    def __stage(name: str, clip_path: str) -> dict:
+        return {
+            "name": name,
+            "checksum": file_checksum(clip_path),
+            "size": os.path.getsize(clip_path),
+            "completed_at": time.time(),
+        }
+
+    def __save(self):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        temp_path = f"{self._path}.temp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self._data, file, indent=4, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self._path)
@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+
+
+class MediaProbe:
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = 256):
+        self._max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "MediaProbe":
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def probe(self, file_path: str) -> dict:
+        return self.__cached(file_path, "metadata", self.__probe_metadata)
+
+    def fps(self, file_path: str) -> float:
+        return self.probe(file_path)["fps"]
+
+    def duration(self, file_path: str) -> float:
+        return self.probe(file_path)["duration"]
+
+    def keyframes(self, file_path: str) -> list[float]:
+        return self.__cached(file_path, "keyframes", self.__probe_keyframes)
+
+    def __cached(self, file_path: str, kind: str, load):
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, kind)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        value = load(file_path)
+
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    @staticmethod
+    def __probe_metadata(file_path: str) -> dict:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "stream=codec_name,profile,pix_fmt,width,height,avg_frame_rate,r_frame_rate"
+                ":format=duration",
+                "-of",
+                "json",
+                file_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        data = json.loads(result.stdout)
+        stream = data["streams"][0]
+        frame_rate = stream["avg_frame_rate"]
+        if frame_rate.endswith("/0"):
+            frame_rate = stream["r_frame_rate"]
+        return {
+            "fps": float(Fraction(frame_rate)),
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "duration": float(data["format"]["duration"]),
+            "codec": stream["codec_name"],
+            "profile": stream.get("profile"),
+            "pixel_format": stream.get("pix_fmt"),
+        }
+
+    @staticmethod
+    def __probe_keyframes(file_path: str) -> list[float]:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "packet=pts_time,flags",
+                "-of",
+                "csv=p=0",
+                file_path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(float(pts_time))
+        return sorted(keyframes)
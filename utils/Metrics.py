@@ -0,0 +1,209 @@
+import json
+import os
+import resource
+import threading
+import time
+
+import psutil
+
+# getrusage block counters are in 512-byte units
+BLOCK_SIZE = 512
+
+
+class Span:
+    def __init__(self, kind: str, name: str, parent: str = None):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.frames = 0
+        self.peak_rss = 0
+        self.exclusive = True
+        self._thread = threading.get_ident()
+        self._start_time = time.time()
+        self._start_wall = time.perf_counter()
+        self._start_thread_time = time.thread_time()
+        self._start_usage = self.__usage()
+
+    def finish(self) -> dict:
+        wall_time = time.perf_counter() - self._start_wall
+        cpu_time, blocks_read, blocks_written = (
+            end - start for start, end in zip(self._start_usage, self.__usage())
+        )
+        if not self.exclusive:
+            cpu_time = (
+                time.thread_time() - self._start_thread_time
+                if threading.get_ident() == self._thread
+                else None
+            )
+            blocks_read = blocks_written = None
+
+        return {
+            "time": self._start_time,
+            "kind": self.kind,
+            "name": self.name,
+            "parent": self.parent,
+            "exclusive": self.exclusive,
+            "wall_time": round(wall_time, 4),
+            "cpu_time": None if cpu_time is None else round(cpu_time, 4),
+            "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1),
+            "frames": self.frames,
+            "fps": round(self.frames / wall_time, 2) if wall_time else 0,
+            "bytes_read": None if blocks_read is None else blocks_read * BLOCK_SIZE,
+            "bytes_written": (
+                None if blocks_written is None else blocks_written * BLOCK_SIZE
+            ),
+        }
+
+    @staticmethod
+    def __usage() -> tuple:
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (
+            own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+            own.ru_inblock + children.ru_inblock,
+            own.ru_oublock + children.ru_oublock,
+        )
+
+
+class MetricsRecorder:
+    PREFIX = "clips_maker"
+
+    def __init__(self, metrics_path: str, sample_interval: float = 0.2):
+        self._jsonl_path = os.path.join(metrics_path, "metrics.jsonl")
+        self._prometheus_path = os.path.join(metrics_path, f"{self.PREFIX}.prom")
+        self._sample_interval = sample_interval
+        self._spans = set()
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+        self._stop_event = threading.Event()
+        os.makedirs(metrics_path, exist_ok=True)
+
+        self._sampler = threading.Thread(
+            target=self.__sample, name="metrics", daemon=True
+        )
+        self._sampler.start()
+
+    def start(self, kind: str, name: str, parent: str = None) -> Span:
+        span = Span(kind, name, parent)
+        span.peak_rss = self.__rss()
+        with self._lock:
+            for open_span in self._spans:
+                if open_span.kind == kind:
+                    open_span.exclusive = span.exclusive = False
+            self._spans.add(span)
+        return span
+
+    def count_frames(self, frames: int, span: Span = None):
+        with self._lock:
+            for open_span in [span] if span else self._spans:
+                open_span.frames += frames
+
+    def finish(self, span: Span) -> dict:
+        with self._lock:
+            self._spans.discard(span)
+        span.peak_rss = max(span.peak_rss, self.__rss())
+        record = span.finish()
+
+        with self._lock:
+            with open(self._jsonl_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if span.kind == "stage":
+                self.__accumulate(record)
+                self.__write_prometheus()
+        return record
+
+    def stop(self):
+        self._stop_event.set()
+        self._sampler.join()
+
+    def __accumulate(self, record: dict):
+        totals = self._totals.setdefault(
+            record["name"],
+            {
+                "runs": 0,
+                "overlapped_runs": 0,
+                "seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "frames": 0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "peak_rss_bytes": 0,
+                "last_fps": 0.0,
+            },
+        )
+        totals["runs"] += 1
+        totals["overlapped_runs"] += not record["exclusive"]
+        totals["seconds"] += record["wall_time"]
+        totals["frames"] += record["frames"]
+        for key, total in (
+            ("cpu_time", "cpu_seconds"),
+            ("bytes_read", "bytes_read"),
+            ("bytes_written", "bytes_written"),
+        ):
+            if record[key] is not None:
+                totals[total] += record[key]
+        totals["peak_rss_bytes"] = max(
+            totals["peak_rss_bytes"], int(record["peak_rss_mb"] * 1024 * 1024)
+        )
+        totals["last_fps"] = record["fps"]
+
+    def __write_prometheus(self):
+        metrics = [
+            ("runs", "counter", "Completed stage runs"),
+            (
+                "overlapped_runs",
+                "counter",
+                "Runs that overlapped another stage, counted with thread CPU only",
+            ),
+            ("seconds", "counter", "Wall time spent in stage"),
+            (
+                "cpu_seconds",
+                "counter",
+                "CPU time of the process and its children, "
+                "or of the stage thread alone for overlapped runs",
+            ),
+            ("frames", "counter", "Frames processed"),
+            ("bytes_read", "counter", "Block I/O bytes read by non-overlapped runs"),
+            (
+                "bytes_written",
+                "counter",
+                "Block I/O bytes written by non-overlapped runs",
+            ),
+            ("peak_rss_bytes", "gauge", "Peak resident memory during stage"),
+            ("last_fps", "gauge", "Frames per second of the last run"),
+        ]
+        lines = []
+        for key, metric_type, description in metrics:
+            name = f"{self.PREFIX}_stage_{key}"
+            if metric_type == "counter":
+                name += "_total"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for stage, totals in sorted(self._totals.items()):
+                label = stage.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{name}{{stage="{label}"}} {totals[key]}')
+
+        temp_path = f"{self._prometheus_path}.temp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self._prometheus_path)
+
+    def __sample(self):
+        while not self._stop_event.wait(self._sample_interval):
+            rss = self.__rss()
+            with self._lock:
+                for span in self._spans:
+                    span.peak_rss = max(span.peak_rss, rss)
+
+    def __rss(self) -> int:
+        try:
+            rss = self._process.memory_info().rss
+            for child in self._process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return rss
+        except psutil.Error:
+            return 0
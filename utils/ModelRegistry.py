@@ -0,0 +1,120 @@
+import gc
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+import psutil
+
+
+class ModelRegistry:
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_models: int = None, memory_budget_mb: int = None):
+        self._max_models = max_models
+        self._memory_budget = (
+            memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        )
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._load_locks = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def shared(cls) -> "ModelRegistry":
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def get(
+        self,
+        model: str,
+        size: str = None,
+        device: str = None,
+        precision: str = None,
+        loader=None,
+    ):
+        key = (model, size, device, precision)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            if loader is None:
+                raise KeyError(f"Model {key} is not loaded and no loader was given")
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+
+            rss_before = self.__rss()
+            instance = loader()
+            model_size = self.__model_size(instance)
+            if model_size is None:
+                model_size = max(self.__rss() - rss_before, 0)
+
+            with self._lock:
+                self._models[key] = instance
+                self._sizes[key] = model_size
+                self.__evict(keep=key)
+            return instance
+
+    def release(
+        self, model: str, size: str = None, device: str = None, precision: str = None
+    ):
+        with self._lock:
+            self.__drop((model, size, device, precision))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._models):
+                self.__drop(key)
+
+    def loaded(self) -> list[tuple]:
+        with self._lock:
+            return list(self._models)
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def __evict(self, keep: tuple):
+        while len(self._models) > 1 and self.__over_budget():
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self.__drop(oldest)
+
+    def __over_budget(self) -> bool:
+        if self._max_models is not None and len(self._models) > self._max_models:
+            return True
+        if (
+            self._memory_budget is not None
+            and self.memory_usage() > self._memory_budget
+        ):
+            return True
+        return False
+
+    def __drop(self, key: tuple):
+        if self._models.pop(key, None) is None:
+            return
+        self._sizes.pop(key, None)
+        gc.collect()
+
+    @staticmethod
+    def __model_size(instance) -> int or None:
+        for module in (instance, getattr(instance, "model", None)):
+            if callable(getattr(module, "named_parameters", None)) and callable(
+                getattr(module, "buffers", None)
+            ):
+                tensors = chain(module.parameters(), module.buffers())
+                return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+        return None
+
+    @staticmethod
+    def __rss() -> int:
+        return psutil.Process().memory_info().rss
@@ -0,0 +1,35 @@
+class RenderPlan:
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.operations = []
+        self.filters = []
+        self.time_maps = []
+
+    def add(self, name: str, operation):
+        self.operations.append((name, operation))
+
+    def add_filter(self, name: str, build):
+        self.filters.append((len(self.operations), name, build))
+
+    def add_time_map(self, time_map):
+        self.time_maps.append((len(self.operations), time_map))
+
+    def time_map_after(self, position: int):
+        time_maps = [
+            time_map for index, time_map in self.time_maps if index >= position
+        ]
+
+        def apply(t: float) -> float:
+            for time_map in time_maps:
+                t = time_map(t)
+            return t
+
+        return apply
+
+    def names(self) -> list[str]:
+        return [name for name, _ in self.operations] + [
+            name for _, name, _ in self.filters
+        ]
+
+    def __bool__(self):
+        return bool(self.operations) or bool(self.filters)
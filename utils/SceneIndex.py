@@ -0,0 +1,170 @@
+import json
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from utils.MediaProbe import MediaProbe
+from utils.utils import RESULTS_PATH
+
+
+class SceneIndex:
+    FILE_NAME = "scenes.npz"
+    HISTOGRAM_BINS = 16
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        results_path: str = RESULTS_PATH,
+        width: int = 64,
+        height: int = 36,
+        threshold: float = 0.25,
+        min_scene_duration: float = 0.5,
+        batch_size: int = 512,
+        media_probe: MediaProbe = None,
+    ):
+        self._results_path = results_path
+        self._width = width
+        self._height = height
+        self._threshold = threshold
+        self._min_scene_duration = min_scene_duration
+        self._batch_size = batch_size
+        self._media_probe = media_probe or MediaProbe.shared()
+        self._cuts = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "SceneIndex":
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def get_params(self) -> dict:
+        return {
+            "width": self._width,
+            "height": self._height,
+            "threshold": self._threshold,
+            "min_scene_duration": self._min_scene_duration,
+        }
+
+    def artifact_path(self, file_path: str) -> str:
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self._results_path, video_name, self.FILE_NAME)
+
+    def load(self, file_path: str) -> np.ndarray:
+        artifact_path = self.artifact_path(file_path)
+        params = json.dumps(self.get_params(), sort_keys=True)
+        with self.__lock_for(artifact_path):
+            if os.path.exists(artifact_path) and os.path.getmtime(
+                artifact_path
+            ) >= os.path.getmtime(file_path):
+                with np.load(artifact_path) as artifact:
+                    if str(artifact["params"]) == params:
+                        return artifact["cuts"]
+
+            cuts = self.detect(file_path)
+            os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+            temp_artifact_path = f"{artifact_path}.temp"
+            with open(temp_artifact_path, "wb") as file:
+                np.savez(file, cuts=cuts, params=np.array(params))
+            os.replace(temp_artifact_path, artifact_path)
+            return cuts
+
+    def detect(self, file_path: str) -> np.ndarray:
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self.__lock_for(key[0]):
+            with self._lock:
+                if key in self._cuts:
+                    return self._cuts[key]
+
+            cuts = self.__detect(file_path)
+            with self._lock:
+                self._cuts = {
+                    cached_key: cached_cuts
+                    for cached_key, cached_cuts in self._cuts.items()
+                    if cached_key[0] != key[0]
+                }
+                self._cuts[key] = cuts
+            return cuts
+
+    @staticmethod
+    def window(
+        cuts: np.ndarray, start_time: float = 0, end_time: float = None
+    ) -> np.ndarray:
+        start = np.searchsorted(cuts, start_time, side="right")
+        end = len(cuts) if end_time is None else np.searchsorted(cuts, end_time)
+        return cuts[start:end] - start_time
+
+    def __lock_for(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def __detect(self, file_path: str) -> np.ndarray:
+        fps = self._media_probe.fps(file_path)
+        frame_size = self._width * self._height
+        process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-v",
+                "error",
+                "-i",
+                file_path,
+                "-an",
+                "-vf",
+                f"scale={self._width}:{self._height}:flags=area,format=gray",
+                "-f",
+                "rawvideo",
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+        scores = []
+        previous = None
+        while True:
+            data = process.stdout.read(frame_size * self._batch_size)
+            count = len(data) // frame_size
+            if not count:
+                break
+            frames = np.frombuffer(data[: count * frame_size], np.uint8).reshape(
+                count, frame_size
+            )
+            if previous is not None:
+                frames = np.concatenate([previous, frames])
+            scores.append(self.__scores(frames))
+            previous = frames[-1:]
+        process.stdout.close()
+        if process.wait():
+            raise subprocess.CalledProcessError(process.returncode, "ffmpeg")
+
+        scores = np.concatenate(scores) if scores else np.empty(0)
+        candidates = np.flatnonzero(scores > self._threshold) + 1
+        cuts = []
+        for frame in candidates:
+            time = frame / fps
+            if time - (cuts[-1] if cuts else 0) >= self._min_scene_duration:
+                cuts.append(time)
+        return np.array(cuts, dtype=np.float64)
+
+    def __scores(self, frames: np.ndarray) -> np.ndarray:
+        count, pixels = frames.shape
+        bins = frames // (256 // self.HISTOGRAM_BINS)
+        offsets = np.arange(count)[:, None] * self.HISTOGRAM_BINS
+        histograms = np.bincount(
+            (bins + offsets).ravel(), minlength=count * self.HISTOGRAM_BINS
+        ).reshape(count, self.HISTOGRAM_BINS)
+        histogram_distance = np.abs(np.diff(histograms, axis=0)).sum(axis=1) / (
+            2 * pixels
+        )
+        pixel_distance = (
+            np.abs(np.diff(frames.astype(np.int16), axis=0)).mean(axis=1) / 255
+        )
+        return np.sqrt(histogram_distance * pixel_distance)
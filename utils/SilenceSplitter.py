@@ -0,0 +1,39 @@
+import numpy as np
+
+
+class SilenceSplitter:
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_duration: float = 0.03,
+        smoothing: float = 0.5,
+        search_window: float = 30.0,
+    ):
+        self._sample_rate = sample_rate
+        self._frame_size = int(sample_rate * frame_duration)
+        self._smoothing_frames = max(1, int(smoothing / frame_duration))
+        self._search_frames = int(search_window / frame_duration)
+
+    def split(self, audio: np.ndarray, chunk_count: int) -> list[tuple[int, int]]:
+        frame_count = len(audio) // self._frame_size
+        if chunk_count <= 1 or frame_count < chunk_count * 2:
+            return [(0, len(audio))]
+
+        frames = np.asarray(audio[: frame_count * self._frame_size]).reshape(
+            frame_count, self._frame_size
+        )
+        energy = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        kernel = np.ones(self._smoothing_frames, np.float32) / self._smoothing_frames
+        energy = np.convolve(energy, kernel, mode="same")
+
+        cuts = []
+        for index in range(1, chunk_count):
+            target = index * frame_count // chunk_count
+            low = max(target - self._search_frames, cuts[-1] + 1 if cuts else 1)
+            high = min(target + self._search_frames, frame_count - 1)
+            if low >= high:
+                continue
+            cuts.append(low + int(np.argmin(energy[low:high])))
+
+        boundaries = [0, *(cut * self._frame_size for cut in cuts), len(audio)]
+        return list(zip(boundaries[:-1], boundaries[1:]))
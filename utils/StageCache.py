@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from utils.Logger import Logger
+from utils.utils import CACHE_PATH
+
+
+class StageCache:
+    def __init__(
+        self,
+        logger: Logger,
+        cache_path: str = CACHE_PATH,
+        max_size_mb: int = 20480,
+    ):
+        self._logger = logger
+        self._cache_path = cache_path
+        self._max_size = max_size_mb * 1024 * 1024
+        self._hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(self._cache_path, exist_ok=True)
+
+    def key(self, stage: str, file_path: str, params: dict = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(stage.encode())
+        digest.update(self.file_hash(file_path).encode())
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def file_hash(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        signature = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if signature in self._hashes:
+                return self._hashes[signature]
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        with self._lock:
+            self._hashes[signature] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def lookup(self, stage: str, file_path: str, params: dict) -> str or None:
+        artifact_path = self.__artifact_path(
+            self.key(stage, file_path, params), file_path
+        )
+        return artifact_path if os.path.exists(artifact_path) else None
+
+    def restore(self, key: str, output_path: str) -> bool:
+        artifact_path = self.__artifact_path(key, output_path)
+        if not os.path.exists(artifact_path):
+            return False
+
+        temp_file_path = f"{output_path}.cache_temp"
+        shutil.copyfile(artifact_path, temp_file_path)
+        os.replace(temp_file_path, output_path)
+        os.utime(artifact_path)
+        return True
+
+    def store(self, key: str, file_path: str):
+        artifact_path = self.__artifact_path(key, file_path)
+        temp_file_path = f"{artifact_path}.temp"
+        shutil.copyfile(file_path, temp_file_path)
+        os.replace(temp_file_path, artifact_path)
+        self.__evict()
+
+    def run(self, stage: str, file_path: str, params: dict, action) -> bool:
+        key = self.key(stage, file_path, params)
+        if self.restore(key, file_path):
+            self._logger.info(f"'{stage}' restored from cache")
+            return True
+
+        action()
+        self.store(key, file_path)
+        return False
+
+    def __artifact_path(self, key: str, file_path: str) -> str:
+        extension = os.path.splitext(file_path)[1]
+        return os.path.join(self._cache_path, f"{key}{extension}")
+
+    def __evict(self):
+        with self._lock:
+            artifacts = [
+                os.path.join(self._cache_path, file)
+                for file in os.listdir(self._cache_path)
+                if not file.endswith(".temp")
+            ]
+            artifacts.sort(key=os.path.getmtime)
+
+            total_size = sum(os.path.getsize(artifact) for artifact in artifacts)
+            while artifacts and total_size > self._max_size:
+                oldest = artifacts.pop(0)
+                total_size -= os.path.getsize(oldest)
+                os.remove(oldest)
+                self._logger.debug(f"Evicted {os.path.basename(oldest)} from cache")
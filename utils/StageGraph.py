@@ -0,0 +1,101 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from utils.Logger import Logger
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        action,
+        inputs: tuple[str, ...] = (),
+        output: str = None,
+        title: str = None,
+        executor: Executor = None,
+    ):
+        self.name = name
+        self.action = action
+        self.inputs = tuple(inputs)
+        self.output = output or name
+        self.title = title or name
+        self.executor = executor
+
+
+class StageGraph:
+    def __init__(self, logger: Logger, max_workers: int = 4):
+        self._logger = logger
+        self._max_workers = max_workers
+        self._stages = []
+
+    def add(
+        self,
+        name: str,
+        action,
+        inputs: tuple[str, ...] = (),
+        output: str = None,
+        title: str = None,
+        executor: Executor = None,
+    ) -> "StageGraph":
+        stage = Stage(name, action, inputs, output, title, executor)
+        if stage.output in {existing.output for existing in self._stages}:
+            raise ValueError(f"Output '{stage.output}' is produced twice")
+        self._stages.append(stage)
+        return self
+
+    def run(self, context: dict, concurrent: bool = False) -> dict:
+        self.__validate(context)
+        if not concurrent:
+            return self.__run_sequential(dict(context))
+        return asyncio.run(self.__run_concurrent(dict(context)))
+
+    def __validate(self, context: dict):
+        available = set(context)
+        for stage in self._stages:
+            missing = [name for name in stage.inputs if name not in available]
+            if missing:
+                raise ValueError(
+                    f"Stage '{stage.name}' needs {missing} before it is declared"
+                )
+            available.add(stage.output)
+
+    def __run_sequential(self, context: dict) -> dict:
+        for stage in self._stages:
+            context[stage.output] = self.__call(
+                stage, *(context[name] for name in stage.inputs)
+            )
+        return context
+
+    async def __run_concurrent(self, context: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        futures = {name: loop.create_future() for name in context}
+        for name, value in context.items():
+            futures[name].set_result(value)
+
+        with ThreadPoolExecutor(
+            self._max_workers, thread_name_prefix="stage"
+        ) as executor:
+            tasks = []
+            for stage in self._stages:
+                task = asyncio.ensure_future(self.__run_stage(stage, futures, executor))
+                futures[stage.output] = task
+                tasks.append(task)
+
+            await asyncio.wait(tasks)
+
+        errors = [task.exception() for task in tasks if task.exception()]
+        if errors:
+            raise errors[0]
+        return {name: future.result() for name, future in futures.items()}
+
+    async def __run_stage(self, stage: Stage, futures: dict, executor: Executor):
+        values = [await futures[name] for name in stage.inputs]
+        loop = asyncio.get_running_loop()
+        if stage.executor:
+            with self._logger.stage(stage.title):
+                return await loop.run_in_executor(stage.executor, stage.action, *values)
+        return await loop.run_in_executor(executor, self.__call, stage, *values)
+
+    def __call(self, stage: Stage, *values):
+        with self._logger.stage(stage.title):
+            return stage.action(*values)
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+class TileUpscaler:
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        scale: int,
+        device: str = "cpu",
+        tile_size: int = 256,
+        tile_overlap: int = 16,
+        batch_size: int = 4,
+        workers: int = 2,
+    ):
+        self._model = model
+        self._scale = scale
+        self._device = torch.device(device)
+        self._tile_size = tile_size
+        self._tile_overlap = tile_overlap
+        self._batch_size = batch_size
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="upscale")
+
+    def enhance(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        tile, overlap, scale = self._tile_size, self._tile_overlap, self._scale
+
+        padded_height = -(-height // tile) * tile
+        padded_width = -(-width // tile) * tile
+        image = frame[:, :, ::-1].astype(np.float32) / 255
+        image = np.pad(
+            image,
+            (
+                (overlap, padded_height - height + overlap),
+                (overlap, padded_width - width + overlap),
+                (0, 0),
+            ),
+            mode="edge",
+        )
+        image = torch.from_numpy(image.transpose(2, 0, 1).copy())
+
+        positions = [
+            (y, x)
+            for y in range(0, padded_height, tile)
+            for x in range(0, padded_width, tile)
+        ]
+        batches = [
+            positions[i : i + self._batch_size]
+            for i in range(0, len(positions), self._batch_size)
+        ]
+
+        output = np.empty((padded_height * scale, padded_width * scale, 3), np.float32)
+        for batch, upscaled_tiles in zip(
+            batches,
+            self._pool.map(lambda batch: self.__run_batch(image, batch), batches),
+        ):
+            for (y, x), upscaled_tile in zip(batch, upscaled_tiles):
+                output[
+                    y * scale : (y + tile) * scale, x * scale : (x + tile) * scale
+                ] = upscaled_tile[
+                    overlap * scale : (overlap + tile) * scale,
+                    overlap * scale : (overlap + tile) * scale,
+                ]
+
+        output = output[: height * scale, : width * scale, ::-1]
+        return (np.clip(output, 0, 1) * 255).round().astype(np.uint8)
+
+    def __run_batch(self, image: torch.Tensor, batch: list[tuple]) -> np.ndarray:
+        size = self._tile_size + 2 * self._tile_overlap
+        tiles = torch.stack([image[:, y : y + size, x : x + size] for y, x in batch])
+        with torch.inference_mode():
+            upscaled_tiles = self._model(tiles.to(self._device))
+        return upscaled_tiles.float().cpu().numpy().transpose(0, 2, 3, 1)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import torch
+from clipsai import Clip, ClipFinder, Transcription
+from clipsai.clip.text_embedder import TextEmbedder
+
+from utils.Logger import Logger
+from utils.ModelRegistry import ModelRegistry
+from utils.utils import RESULTS_PATH
+
+
+class TopicIndex:
+    FILE_NAME = "topics.npz"
+    VERSION = 2
+    STAGES = (((5, 7), None), ((11, 17), 180), ((37, 53, 73, 97), 600))
+    DUPLICATE_TOLERANCE = 15
+    TILING_PARAMS = (
+        "cutoff_policy",
+        "embedding_aggregation_pool_method",
+        "smoothing_width",
+        "window_compare_pool_method",
+    )
+
+    def __init__(
+        self,
+        clip_finder: ClipFinder,
+        logger: Logger,
+        model_registry: ModelRegistry = None,
+        results_path: str = RESULTS_PATH,
+    ):
+        self._clip_finder = clip_finder
+        self._logger = logger
+        self._model_registry = model_registry or ModelRegistry.shared()
+        self._results_path = results_path
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def artifact_path(self, file_path: str) -> str:
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self._results_path, video_name, self.FILE_NAME)
+
+    def find_clips(
+        self,
+        file_path: str,
+        transcription: Transcription,
+        min_duration: float,
+        max_duration: float,
+    ) -> list[Clip]:
+        candidates = self.candidates(file_path, transcription)
+        finder_min_duration = self._clip_finder._min_clip_duration
+        finder_max_duration = self._clip_finder._max_clip_duration
+
+        accepted = []
+        if transcription.end_time <= finder_max_duration:
+            accepted.append(
+                (0, len(transcription.get_char_info()), 0.0, transcription.end_time)
+            )
+
+        for tile_round in np.unique(candidates[:, 1]):
+            rows = candidates[candidates[:, 1] == tile_round]
+            stage_min_duration = self.STAGES[int(rows[0, 0])][1] or finder_min_duration
+            accepted += [
+                (start_char, end_char, start_time, end_time)
+                for start_char, end_char, start_time, end_time in rows[:, 2:6]
+                if stage_min_duration <= end_time - start_time <= finder_max_duration
+                and not self.__is_duplicate(start_time, end_time, accepted)
+            ]
+
+        return [
+            Clip(float(start_time), float(end_time), int(start_char), int(end_char))
+            for start_char, end_char, start_time, end_time in accepted
+            if min_duration <= end_time - start_time <= max_duration
+        ]
+
+    def candidates(self, file_path: str, transcription: Transcription) -> np.ndarray:
+        sentences_info = transcription.get_sentence_info()
+        text_digest = self.__digest(
+            [
+                (sentence["sentence"], sentence["start_time"], sentence["end_time"])
+                for sentence in sentences_info
+            ]
+        )
+        tiling_digest = self.__digest(
+            {
+                "version": self.VERSION,
+                **{
+                    name: getattr(self._clip_finder, f"_{name}", None)
+                    for name in self.TILING_PARAMS
+                },
+            }
+        )
+        artifact_path = self.artifact_path(file_path)
+
+        with self._lock:
+            index = self._indexes.get(artifact_path)
+        if index is None and os.path.exists(artifact_path):
+            with np.load(artifact_path) as artifact:
+                index = {name: artifact[name] for name in artifact.files}
+            with self._lock:
+                self._indexes[artifact_path] = index
+        if index is not None and str(index["text_digest"]) == text_digest:
+            if str(index["tiling_digest"]) == tiling_digest:
+                self._logger.info("Topic candidates loaded from cache")
+                return index["candidates"]
+            embeddings = index["embeddings"]
+        else:
+            self._logger.info(f"Embedding {len(sentences_info)} sentences")
+            embeddings = self.__embed(sentences_info)
+
+        self._logger.info("Scoring topic boundaries")
+        index = {
+            "text_digest": np.array(text_digest),
+            "tiling_digest": np.array(tiling_digest),
+            "embeddings": embeddings,
+            "candidates": self.__tile(sentences_info, embeddings),
+        }
+        self.__save(artifact_path, index)
+        with self._lock:
+            self._indexes[artifact_path] = index
+        return index["candidates"]
+
+    def __embed(self, sentences_info: list[dict]) -> np.ndarray:
+        text_embedder = self._model_registry.get(
+            "sentence-transformers", "all-roberta-large-v1", loader=TextEmbedder
+        )
+        sentences = [sentence["sentence"] for sentence in sentences_info]
+        return text_embedder.embed_sentences(sentences).cpu().numpy()
+
+    def __tile(self, sentences_info: list[dict], embeddings: np.ndarray) -> np.ndarray:
+        rows = []
+        tile_round = 0
+        for stage, (k_values, _) in enumerate(self.STAGES):
+            for k in k_values:
+                clips, clip_embeddings = sentences_info, torch.from_numpy(embeddings)
+                while len(clip_embeddings) > 8:
+                    clips, clip_embeddings = self._clip_finder._text_tile(
+                        clips, clip_embeddings, k
+                    )
+                    rows += [
+                        (
+                            stage,
+                            tile_round,
+                            clip["start_char"],
+                            clip["end_char"],
+                            clip["start_time"],
+                            clip["end_time"],
+                            clip["norm"],
+                        )
+                        for clip in clips
+                    ]
+                    tile_round += 1
+        return np.array(rows, dtype=np.float64).reshape(-1, 7)
+
+    @staticmethod
+    def __save(artifact_path: str, index: dict):
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        temp_artifact_path = f"{artifact_path}.temp"
+        with open(temp_artifact_path, "wb") as file:
+            np.savez(file, **index)
+        os.replace(temp_artifact_path, artifact_path)
+
+    @classmethod
+    def __is_duplicate(cls, start_time: float, end_time: float, clips: list) -> bool:
+        return any(
+            abs(start_time - clip[2]) + abs(end_time - clip[3])
+            < cls.DUPLICATE_TOLERANCE
+            for clip in clips
+        )
+
+    @staticmethod
+    def __digest(value) -> str:
+        return hashlib.sha256(
+            json.dumps(value, sort_keys=True, default=str).encode()
+        ).hexdigest()
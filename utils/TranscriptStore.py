@@ -0,0 +1,208 @@
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+from bisect import bisect_right
+from contextlib import closing
+
+from clipsai import Transcription
+
+from utils.utils import RESULTS_PATH
+
+
+class TranscriptStore:
+    FILE_NAME = "transcript.sqlite"
+    SCHEMA = """
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE chars (
+            idx INTEGER PRIMARY KEY,
+            char TEXT,
+            start_time REAL,
+            end_time REAL,
+            speaker INTEGER
+        );
+        CREATE TABLE words (
+            idx INTEGER PRIMARY KEY,
+            word TEXT,
+            start_char INTEGER,
+            end_char INTEGER,
+            start_time REAL,
+            end_time REAL,
+            speaker INTEGER,
+            sentence_id INTEGER
+        );
+        CREATE TABLE sentences (
+            idx INTEGER PRIMARY KEY,
+            sentence TEXT,
+            start_char INTEGER,
+            end_char INTEGER,
+            start_time REAL,
+            end_time REAL
+        );
+        CREATE INDEX words_start_time ON words (start_time);
+        CREATE INDEX sentences_start_time ON sentences (start_time);
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, results_path: str = RESULTS_PATH):
+        self._results_path = results_path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "TranscriptStore":
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def artifact_path(self, file_path: str) -> str:
+        video_name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self._results_path, video_name, self.FILE_NAME)
+
+    def save(self, file_path: str, transcription: Transcription, params: dict):
+        artifact_path = self.artifact_path(file_path)
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        temp_artifact_path = f"{artifact_path}.temp"
+        if os.path.exists(temp_artifact_path):
+            os.remove(temp_artifact_path)
+
+        char_info = transcription.get_char_info()
+        word_info = transcription.get_word_info()
+        sentence_info = transcription.get_sentence_info()
+        sentence_starts = [sentence["start_char"] for sentence in sentence_info]
+        meta = {
+            "source": self.__signature(file_path),
+            "params": json.dumps(params, sort_keys=True, default=str),
+            "source_software": transcription.source_software,
+            "time_created": transcription.created_time.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "language": transcription.language,
+        }
+
+        with self._lock, closing(sqlite3.connect(temp_artifact_path)) as connection:
+            connection.executescript(self.SCHEMA)
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+            connection.executemany(
+                "INSERT INTO chars VALUES (?, ?, ?, ?, ?)",
+                (
+                    (i, c["char"], c["start_time"], c["end_time"], c["speaker"])
+                    for i, c in enumerate(char_info)
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO words VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        i,
+                        w["word"],
+                        w["start_char"],
+                        w["end_char"],
+                        w["start_time"],
+                        w["end_time"],
+                        w["speaker"],
+                        bisect_right(sentence_starts, w["start_char"]) - 1,
+                    )
+                    for i, w in enumerate(word_info)
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO sentences VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        i,
+                        s["sentence"],
+                        s["start_char"],
+                        s["end_char"],
+                        s["start_time"],
+                        s["end_time"],
+                    )
+                    for i, s in enumerate(sentence_info)
+                ),
+            )
+            connection.commit()
+        os.replace(temp_artifact_path, artifact_path)
+
+    def load(self, file_path: str, params: dict) -> Transcription or None:
+        connection = self.__connect(file_path)
+        if connection is None:
+            return None
+
+        with closing(connection):
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+            if meta.get("params") != json.dumps(params, sort_keys=True, default=str):
+                return None
+
+            char_info = [
+                {
+                    "char": char,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "speaker": speaker,
+                }
+                for char, start_time, end_time, speaker in connection.execute(
+                    "SELECT char, start_time, end_time, speaker FROM chars ORDER BY idx"
+                )
+            ]
+        speakers = {c["speaker"] for c in char_info if c["speaker"] is not None}
+
+        return Transcription(
+            {
+                "source_software": meta["source_software"],
+                "time_created": meta["time_created"],
+                "language": meta["language"],
+                "num_speakers": len(speakers) or None,
+                "char_info": char_info,
+            }
+        )
+
+    def words(
+        self, file_path: str, start_time: float = 0, end_time: float = None
+    ) -> list[dict] or None:
+        connection = self.__connect(file_path)
+        if connection is None:
+            return None
+
+        with closing(connection):
+            rows = connection.execute(
+                "SELECT word, start_char, end_char, start_time, end_time, speaker, "
+                "sentence_id FROM words WHERE start_time >= ? AND end_time <= ? "
+                "ORDER BY start_time, idx",
+                (start_time, float("inf") if end_time is None else end_time),
+            ).fetchall()
+
+        return [
+            {
+                "word": word,
+                "start_char": start_char,
+                "end_char": end_char,
+                "start_time": word_start,
+                "end_time": word_end,
+                "speaker": speaker,
+                "sentence_id": sentence_id,
+            }
+            for word, start_char, end_char, word_start, word_end, speaker, sentence_id in rows
+        ]
+
+    def __connect(self, file_path: str) -> sqlite3.Connection or None:
+        artifact_path = self.artifact_path(file_path)
+        if not os.path.exists(artifact_path):
+            return None
+
+        connection = sqlite3.connect(
+            pathlib.Path(artifact_path).resolve().as_uri() + "?mode=ro", uri=True
+        )
+        source = connection.execute(
+            "SELECT value FROM meta WHERE key = 'source'"
+        ).fetchone()
+        if source is None or source[0] != self.__signature(file_path):
+            connection.close()
+            return None
+        return connection
+
+    @staticmethod
+    def __signature(file_path: str) -> str:
+        stat = os.stat(file_path)
+        return json.dumps([stat.st_size, stat.st_mtime_ns])
@@ -25,5 +25,7 @@ RESOURCES_PATH = os.path.join(BASE_PATH, "resources")
 SOURCES_PATH = os.path.join(RESOURCES_PATH, "sources")
 RESULTS_PATH = os.path.join(RESOURCES_PATH, "results")
 ASSERTS_PATH = os.path.join(RESOURCES_PATH, "asserts")
+CACHE_PATH = os.path.join(RESULTS_PATH, "cache")
+METRICS_PATH = os.path.join(RESULTS_PATH, "metrics")
 
 PYANNOTE_TOKEN = os.getenv("PYANNOTE_TOKEN")